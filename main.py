@@ -4,8 +4,8 @@ import re
 
 from src.analyzer.report.main import generate_reports
 from src.config import config
-from src.scanner.scanner import run_scan
-from src.scanner.utils.utils import check_error_files, reset_error_files
+from src.scanner.scanner import run_scans, driver_pool
+from src.scanner.utils.utils import check_error_files
 
 #import daemon
 #from setproctitle import setproctitle
@@ -13,7 +13,6 @@ from src.scanner.utils.utils import check_error_files, reset_error_files
 log_file = os.path.join('.', 'scan.log')
 
 error_directory = os.path.join('.', 'src', 'data', 'errors')
-max_assessments = 10
 
 def main():
     input_directory = os.path.join('.', 'src', 'data', 'source')
@@ -30,25 +29,12 @@ def main():
         logging.error("No expected headers defined in config file (config.py).")
         return
 
-    assessments = 0
-    while True:
-        for file in files:
-            file_path = os.path.join(input_directory, file)
-            logging.info(f"(Scanning file: {file}")
-            try:
-                run_scan(file_path)
-            except Exception as e:
-                logging.error(f"Error scanning {file}: {e}")
+    logging.info(f"Scanning files: {', '.join(files)}")
+    run_scans([os.path.join(input_directory, file) for file in files])
+    driver_pool.shutdown()
 
-        assessments += 1
-        if check_error_files():
-            if assessments >= max_assessments:
-                logging.warning(f"Max attempts reached ({max_assessments}). Some errors may persist.")
-                break
-            logging.warning(f"Found {len(files)} error files in '{error_directory}'. Please check the files.")
-            reset_error_files()
-        else:
-            break
+    if check_error_files():
+        logging.warning(f"Some errors persisted after retries. Please check the files in '{error_directory}'.")
     logging.info("Scanning completed successfully. Generating reports...")
     generate_reports()
     logging.info("Reports generated successfully.")
@@ -1,3 +1,6 @@
+import numpy as np
+import pandas as pd
+
 from src.config import config, EXPECTED_HEADERS_KEY, DEPRECATED_HEADERS, HEADERS_MULTIPLIERS, CRITICAL_HEADERS, \
     COL_CRITICAL_HEADER_INCONSISTENCY_BETWEEN_PLATFORMS, \
     COL_HEADER_INCONSISTENCY_BETWEEN_PLATFORMS
@@ -14,6 +17,9 @@ PENALTY_BETWEEN_PLATFORMS_NON_CRITICAL = 0.90
 HEADER_SCORE_BY_PLATFORM_COL = "header_score_by_platform"
 HEADER_AVG_SCORE_BTW_PLATFORMS_COL = "header_avg_score_btw_platforms"
 HEADER_COMPONENT_SCORE_COL = "header_component_score"
+ABSENT, STRONG, WEAK, OTHER = range(4)
+CONFIG_STATES = {"strong": STRONG, "weak": WEAK}
+HTTP_VERSION_MULTIPLIERS = {"h3": HTTP_V3_POINTS, "h2": HTTP_V2_POINTS}
 
 
 def calculate_header_scores(dataframe):
@@ -23,10 +29,7 @@ def calculate_header_scores(dataframe):
     dataframe[HEADER_AVG_SCORE_BTW_PLATFORMS_COL] = 0
     dataframe[HEADER_COMPONENT_SCORE_COL] = 0
 
-    dataframe[HEADER_SCORE_BY_PLATFORM_COL] = dataframe.apply(
-        lambda x: sum(calculate_header_presence_and_config(header, x) for header in expected_headers),
-        axis=1
-    ).round(2)
+    dataframe[HEADER_SCORE_BY_PLATFORM_COL] = calculate_header_score_by_platform(dataframe, expected_headers).round(2)
 
     dataframe[HEADER_AVG_SCORE_BTW_PLATFORMS_COL] = dataframe.groupby(
         ["ETER_ID"]
@@ -44,9 +47,7 @@ def calculate_header_scores(dataframe):
             * (1 - (platform_counts / 100))
     )
     penalty_combined = penalty_combined.where(penalty_combined > 0, 1)
-    http_version_multiplier = dataframe["protocol_http"].apply(
-        lambda x: HTTP_V3_POINTS if x.lower() == "h3" else HTTP_V2_POINTS if x.lower() == "h2" else 1
-    )
+    http_version_multiplier = dataframe["protocol_http"].str.lower().map(HTTP_VERSION_MULTIPLIERS).fillna(1)
 
     dataframe[HEADER_COMPONENT_SCORE_COL] = (
             (dataframe[HEADER_AVG_SCORE_BTW_PLATFORMS_COL]
@@ -57,6 +58,61 @@ def calculate_header_scores(dataframe):
     return dataframe
 
 
+def calculate_header_score_by_platform(dataframe, expected_headers):
+    weights = get_header_weights(expected_headers)
+    states = get_header_states(dataframe, expected_headers)
+    scores = weights[np.arange(len(expected_headers)), states]
+    # Summed header by header, in the order of the row-wise sum, so the rounding matches it to the last bit.
+    total = np.zeros(len(dataframe))
+    for column in scores.T:
+        total = total + column
+    return pd.Series(total, index=dataframe.index)
+
+
+def get_header_weights(expected_headers):
+    # The score of a header only depends on its presence and configuration, so each state is scored once.
+    weights = np.zeros((len(expected_headers), OTHER + 1))
+    for index, header in enumerate(expected_headers):
+        for state, config_value in ((STRONG, "strong"), (WEAK, "weak"), (OTHER, "")):
+            row = {f"{header}_presence": True, f"{header}_config": config_value}
+            weights[index, state] = calculate_header_presence_and_config(header, row)
+    return weights
+
+
+def get_header_states(dataframe, expected_headers):
+    states = np.full((len(dataframe), len(expected_headers)), ABSENT, dtype=np.int8)
+    for index, header in enumerate(expected_headers):
+        presence_col = f"{header}_presence"
+        config_col = f"{header}_config"
+        if presence_col not in dataframe.columns:
+            continue
+        present = is_truthy(dataframe[presence_col])
+        if config_col in dataframe.columns:
+            codes, values = pd.factorize(dataframe[config_col])
+            lookup = np.array([CONFIG_STATES.get(value.lower(), OTHER) if isinstance(value, str) else OTHER
+                               for value in values] + [OTHER], dtype=np.int8)
+            # factorize codes missing values as -1, which picks the trailing OTHER.
+            config_states = lookup[codes]
+        else:
+            config_states = np.full(len(dataframe), OTHER, dtype=np.int8)
+        states[:, index] = np.where(present, config_states, ABSENT)
+    return states
+
+
+def is_truthy(values):
+    # Same truth test as the row-wise check: NaN and non-empty strings such as "False" count as present, None does not.
+    if pd.api.types.is_bool_dtype(values.dtype) and not values.hasnans:
+        return values.to_numpy(dtype=bool)
+    if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_extension_array_dtype(values.dtype):
+        return values.to_numpy() != 0
+    codes, uniques = pd.factorize(values)
+    truth = np.array([bool(value) for value in uniques] + [True], dtype=bool)[codes]
+    missing = codes == -1
+    if missing.any():
+        truth[missing] = [value is not None for value in values.to_numpy(dtype=object)[missing]]
+    return truth
+
+
 def calculate_header_presence_and_config(header, row):
     deprecated_headers = [h.lower() for h in config[DEPRECATED_HEADERS]]
     multipliers = {k.lower(): v for k, v in config[HEADERS_MULTIPLIERS].items()}
@@ -3,6 +3,8 @@ import re
 import pandas as pd
 import os
 
+from src.config import config
+
 
 def extract_country_and_platform(filename):
     parts = filename.replace('.csv', '').split('_')
@@ -11,7 +13,26 @@ def extract_country_and_platform(filename):
     return parts[0], parts[1]
 
 
-def load_results(input_directory):
+def load_results(input_directory, countries=None, platforms=None, since=None, columns=None, nuts2=None):
+    if config.get('result_store', 'csv') == 'sqlite':
+        from src.scanner.result_db import read_results, DATABASE_PATH
+
+        data = read_results(os.path.join(input_directory, os.path.basename(DATABASE_PATH)), countries, platforms,
+                            nuts2, since, columns)
+        print(f"Loaded {len(data)} latest results from the results database.")
+        if not data.empty:
+            return data
+        print("No results in the results database, falling back to CSV files.")
+
+    if config.get('result_store', 'csv') == 'parquet':
+        from src.scanner.result_store import read_results, STORE_DIRNAME
+
+        data = read_results(os.path.join(input_directory, STORE_DIRNAME), countries, platforms, since, columns)
+        print(f"Loaded {len(data)} results from the Parquet store.")
+        if not data.empty:
+            return data
+        print("No results in the Parquet store, falling back to CSV files.")
+
     files = [f for f in os.listdir(input_directory) if re.match(r'^[a-zA-Z]{2}_.*\.csv$', f)]
     print(f"Found {len(files)} result files to analyze.")
 
@@ -24,9 +45,12 @@ def load_results(input_directory):
         file_path = os.path.join(input_directory, file)
         try:
             country, platform = extract_country_and_platform(os.path.basename(file))
+            if (countries is not None and country not in countries) or \
+                    (platforms is not None and platform not in platforms):
+                continue
             print(f"Loading file: {file} (Country: {country}, Platform: {platform})")
 
-            df = pd.read_csv(file_path)
+            df = pd.read_csv(file_path, usecols=lambda column: columns is None or column in columns)
             df['country'] = country
             df['platform'] = platform
             data_frames.append(df)
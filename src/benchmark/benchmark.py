@@ -0,0 +1,180 @@
+import argparse
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src.benchmark.web_farm import WebFarm, create_certificate, generate_hosts
+from src.config import config
+from src.scanner.result_db import DATABASE_PATH, read_results
+from src.scanner.result_store import CSV_STORE, PARQUET_STORE, SQLITE_STORE, STORE_DIRNAME, find_files
+from src.scanner.utils.process import get_tree_rss
+
+SOURCE_FILENAME = "zz-benchmark.csv"
+RSS_INTERVAL = 0.5
+
+
+class RssSampler:
+    def __init__(self, interval=RSS_INTERVAL):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+        return self.peak
+
+    def sample(self):
+        self.peak = max(self.peak, get_tree_rss(os.getpid()))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Scan a local web farm and report scanner throughput.")
+    parser.add_argument("--hosts", type=int, default=200, help="number of virtual hosts to scan")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the host mix and headers")
+    parser.add_argument("--engine", choices=["probe", "browser"], default=config.get('scan_engine', 'browser'))
+    parser.add_argument("--profile", choices=["full", "headers_only"], default=config.get('scan_profile', 'full'))
+    parser.add_argument("--browser-mode", choices=["per_platform", "shared"],
+                        default=config.get('browser_mode', 'per_platform'))
+    parser.add_argument("--timeout", type=float, default=10, help="page load and probe timeout in seconds")
+    parser.add_argument("--retries", action="store_true", help="keep the configured retry policy")
+    parser.add_argument("--workdir", help="directory for the source CSV and scan output (default: temporary)")
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    return parser.parse_args()
+
+
+def configure(arguments):
+    config['scan_engine'] = arguments.engine
+    config['scan_profile'] = arguments.profile
+    config['browser_mode'] = arguments.browser_mode
+    config['timeout'] = arguments.timeout
+    config['probe_timeout'] = arguments.timeout
+    config['connect_timeout'] = min(arguments.timeout, config.get('connect_timeout', 5))
+    config['row_deadline'] = arguments.timeout * 4
+    # Every virtual host shares one registrable domain and address, and the cache would hide repeated runs.
+    config['rate_limits'] = {}
+    config['scan_cache_ttl'] = 0
+    if not arguments.retries:
+        config['retry_policy'] = {}
+
+
+def write_source(hosts, directory):
+    source_directory = os.path.join(directory, 'src', 'data', 'source')
+    os.makedirs(source_directory, exist_ok=True)
+    source_file = os.path.join(source_directory, SOURCE_FILENAME)
+    pd.DataFrame([{"ETER_ID": f"ZZ{index:05d}", "Institution Name": f"Benchmark {host.kind} {index}", "url": name}
+                  for index, (name, host) in enumerate(hosts.items())]).to_csv(source_file, index=False)
+    return source_file
+
+
+def count_rows(directory, folder):
+    total = 0
+    output_directory = os.path.join(directory, 'src', 'data', folder)
+    if not os.path.isdir(output_directory):
+        return total
+    for filename in os.listdir(output_directory):
+        if filename.endswith('.csv'):
+            total += len(pd.read_csv(os.path.join(output_directory, filename)))
+    return total
+
+
+def count_results(directory):
+    results_directory = os.path.join(directory, 'src', 'data', 'results')
+    if config.get('result_store', CSV_STORE) == SQLITE_STORE:
+        path = os.path.join(results_directory, os.path.basename(DATABASE_PATH))
+        return len(read_results(path, columns=["ETER_ID"], latest=False))
+    if config.get('result_store', CSV_STORE) == PARQUET_STORE:
+        files = find_files(os.path.join(results_directory, STORE_DIRNAME))
+        return sum(pq.ParquetFile(file).metadata.num_rows for file in files)
+    return count_rows(directory, 'results')
+
+
+def read_latency(directory):
+    summary_file = os.path.join(directory, 'src', 'data', 'results', 'metrics',
+                                f"{os.path.splitext(SOURCE_FILENAME)[0]}_metrics.csv")
+    if not os.path.exists(summary_file):
+        return None, None
+    summary = pd.read_csv(summary_file).set_index("stage")
+    if "row" not in summary.index:
+        return None, None
+    return summary.loc["row", "p50"], summary.loc["row", "p95"]
+
+
+def run_benchmark(arguments):
+    directory = os.path.abspath(arguments.workdir or tempfile.mkdtemp(prefix="scanner-benchmark-"))
+    os.makedirs(directory, exist_ok=True)
+    hosts = generate_hosts(arguments.hosts, arguments.seed)
+    source_file = write_source(hosts, directory)
+    farm = WebFarm(hosts, *create_certificate(directory))
+    farm.start()
+
+    configure(arguments)
+    # The scanner writes its output relative to the working directory, keep it out of the repository.
+    os.chdir(directory)
+    from src.scanner import scanner
+
+    for name in hosts:
+        scanner.resolver.add(name, [farm.address])
+    # A reused workdir may hold output of earlier runs and a journal of an interrupted one, only this run counts.
+    results_before, errors_before = count_results(directory), count_rows(directory, 'errors')
+    sampler = RssSampler()
+    sampler.start()
+    started = time.monotonic()
+    job = None
+    try:
+        job = scanner.run_scan(source_file)
+    finally:
+        elapsed = time.monotonic() - started
+        scanner.driver_pool.shutdown()
+        peak_rss = sampler.stop()
+        farm.stop()
+
+    p50, p95 = read_latency(directory)
+    scanned = len(hosts) - (job.skipped if job is not None else 0)
+    return {
+        "hosts": len(hosts),
+        "rows_scanned": scanned,
+        "engine": arguments.engine,
+        "profile": arguments.profile,
+        "browser_mode": arguments.browser_mode,
+        "elapsed_seconds": round(elapsed, 3),
+        "urls_per_second": round(scanned / elapsed, 3) if elapsed else None,
+        "row_latency_p50": p50,
+        "row_latency_p95": p95,
+        "peak_rss_mb": round(peak_rss / (1024 * 1024), 1),
+        "results": count_results(directory) - results_before,
+        "errors": count_rows(directory, 'errors') - errors_before,
+        "requests_served": farm.requests,
+        "workdir": directory,
+    }
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    arguments = parse_arguments()
+    output = os.path.abspath(arguments.output) if arguments.output else None
+    report = run_benchmark(arguments)
+    for key, value in report.items():
+        print(f"{key:>18}: {value}")
+    if output:
+        with open(output, mode='w', encoding='utf-8') as report_file:
+            json.dump(report, report_file, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
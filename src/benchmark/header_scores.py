@@ -0,0 +1,79 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.analyzer.calculator.headers_calc import HEADER_SCORE_BY_PLATFORM_COL, calculate_header_presence_and_config, \
+    calculate_header_scores
+from src.config import config, EXPECTED_HEADERS_KEY
+
+PLATFORMS = ["desktop", "mobile"]
+PROTOCOLS = ["h3", "h2", "http/1.1"]
+CONFIGS = ["Strong", "Weak", "Missing"]
+
+
+def generate_results(rows, seed=0):
+    # Two platforms per institution; a header is configured whenever it is present.
+    generator = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        "ETER_ID": [f"ZZ{index // len(PLATFORMS):07d}" for index in range(rows)],
+        "platform": np.resize(PLATFORMS, rows),
+        "protocol_http": generator.choice(PROTOCOLS, rows),
+    })
+    for header in config[EXPECTED_HEADERS_KEY]:
+        header = header.lower()
+        present = generator.random(rows) < 0.6
+        frame[f"{header}_presence"] = present
+        frame[f"{header}_config"] = np.where(present, generator.choice(CONFIGS[:2], rows), CONFIGS[2])
+    return frame
+
+
+def score_row_by_row(frame):
+    expected_headers = [header.lower() for header in config[EXPECTED_HEADERS_KEY]]
+    return frame.apply(
+        lambda x: sum(calculate_header_presence_and_config(header, x) for header in expected_headers), axis=1
+    ).round(2)
+
+
+def run_benchmark(rows, check_rows, seed):
+    frame = generate_results(rows, seed)
+
+    start = time.perf_counter()
+    scored = calculate_header_scores(frame.copy())
+    vectorized = time.perf_counter() - start
+
+    sample = frame.head(check_rows)
+    start = time.perf_counter()
+    expected = score_row_by_row(sample)
+    row_by_row = time.perf_counter() - start
+
+    actual = scored[HEADER_SCORE_BY_PLATFORM_COL].head(check_rows)
+    return {
+        "rows": rows,
+        "vectorized_seconds": round(vectorized, 3),
+        "vectorized_rows_per_second": round(rows / vectorized),
+        "row_by_row_rows_per_second": round(len(sample) / row_by_row),
+        "checked_rows": len(sample),
+        "mismatches": int((actual.to_numpy() != expected.to_numpy()).sum()),
+    }
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Time the header scoring on synthetic scan results.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="number of synthetic result rows")
+    parser.add_argument("--check-rows", type=int, default=20_000,
+                        help="rows compared against, and timed with, the row-by-row scoring")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the synthetic results")
+    return parser.parse_args()
+
+
+def main():
+    arguments = parse_arguments()
+    report = run_benchmark(arguments.rows, arguments.check_rows, arguments.seed)
+    for key, value in report.items():
+        print(f"{key:>28}: {value}")
+
+
+if __name__ == "__main__":
+    main()
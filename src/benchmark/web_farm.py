@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import os
+import random
+import ssl
+import subprocess
+import threading
+
+DOMAIN = "bench.localhost"
+HTTP_PORT = 80
+HTTPS_PORT = 443
+MAX_REQUEST_LINES = 100
+BODY = b"<!DOCTYPE html><html><head><title>Benchmark</title></head><body><p>Benchmark host</p></body></html>"
+
+SECURE = "secure"
+PLAIN = "plain"
+CROSS_DOMAIN = "cross"
+SLOW = "slow"
+HANG = "hang"
+CHALLENGE = "challenge"
+DEFAULT_MIX = {SECURE: 0.55, PLAIN: 0.15, CROSS_DOMAIN: 0.1, SLOW: 0.12, HANG: 0.05, CHALLENGE: 0.03}
+
+HEADER_VALUES = {
+    "Strict-Transport-Security": ["max-age=31536000; includeSubDomains; preload", "max-age=31536000; includeSubDomains",
+                                  "max-age=86400"],
+    "Content-Security-Policy": ["default-src 'self'; form-action 'self'; object-src 'none'; frame-ancestors 'none'",
+                                "upgrade-insecure-requests", "default-src * 'unsafe-inline' 'unsafe-eval'"],
+    "X-Frame-Options": ["DENY", "SAMEORIGIN", "ALLOW-FROM https://example.org"],
+    "X-Content-Type-Options": ["nosniff"],
+    "X-XSS-Protection": ["1; mode=block", "0"],
+    "Referrer-Policy": ["strict-origin-when-cross-origin", "no-referrer", "unsafe-url"],
+    "Access-Control-Allow-Origin": ["*", "https://www.example.org"],
+    "Cross-Origin-Opener-Policy": ["same-origin", "unsafe-none"],
+    "Cross-Origin-Embedder-Policy": ["require-corp", "unsafe-none"],
+    "Cross-Origin-Resource-Policy": ["same-origin", "cross-origin"],
+    "Set-Cookie": ["session=1; Secure; HttpOnly; SameSite=Lax", "session=1; Path=/"],
+}
+# Share of hosts sending each header, close to what the source institutions send.
+HEADER_ADOPTION = {
+    "Strict-Transport-Security": 0.6, "Content-Security-Policy": 0.25, "X-Frame-Options": 0.5,
+    "X-Content-Type-Options": 0.55, "X-XSS-Protection": 0.3, "Referrer-Policy": 0.3,
+    "Access-Control-Allow-Origin": 0.1, "Cross-Origin-Opener-Policy": 0.05, "Cross-Origin-Embedder-Policy": 0.03,
+    "Cross-Origin-Resource-Policy": 0.05, "Set-Cookie": 0.4,
+}
+
+
+class VirtualHost:
+    def __init__(self, name, kind, headers, delay=0.0, target=None):
+        self.name = name
+        self.kind = kind
+        self.headers = headers
+        self.delay = delay
+        self.target = target
+
+    def __repr__(self):
+        return f"VirtualHost(name={self.name}, kind={self.kind})"
+
+
+def generate_hosts(count, seed=0, mix=None, slow_delay=(0.5, 3.0)):
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    kinds = rng.choices(list(mix), weights=list(mix.values()), k=count)
+    hosts = {}
+    for index, kind in enumerate(kinds):
+        name = f"{kind}-{index}.{DOMAIN}"
+        headers = {header: rng.choice(HEADER_VALUES[header])
+                   for header, adoption in HEADER_ADOPTION.items() if rng.random() < adoption}
+        delay = rng.uniform(*slow_delay) if kind == SLOW else 0.0
+        hosts[name] = VirtualHost(name, kind, headers, delay)
+
+    secure_hosts = [name for name, host in hosts.items() if host.kind == SECURE] or list(hosts)
+    for host in hosts.values():
+        if host.kind == CROSS_DOMAIN:
+            host.target = rng.choice(secure_hosts)
+    return hosts
+
+
+def create_certificate(directory):
+    certificate = os.path.join(directory, "web_farm.crt")
+    key = os.path.join(directory, "web_farm.key")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "2",
+                    "-subj", f"/CN=*.{DOMAIN}", "-addext", f"subjectAltName=DNS:*.{DOMAIN},DNS:{DOMAIN}",
+                    "-keyout", key, "-out", certificate], check=True, capture_output=True)
+    return certificate, key
+
+
+class WebFarm:
+    def __init__(self, hosts, certificate, key, address="127.0.0.1"):
+        self.hosts = hosts
+        self.address = address
+        self.ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        self.ssl_context.load_cert_chain(certificate, key)
+        self.ssl_context.set_alpn_protocols(["http/1.1"])
+        self.requests = 0
+        self._loop = None
+        self._servers = []
+        self._thread = None
+        self._started = threading.Event()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="web-farm", daemon=True)
+        self._thread.start()
+        self._started.wait()
+        if not self._servers:
+            raise RuntimeError(f"Web farm could not listen on ports {HTTP_PORT}/{HTTPS_PORT} of {self.address}.")
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._servers = [
+                self._loop.run_until_complete(asyncio.start_server(
+                    lambda reader, writer: self.handle(reader, writer, False), self.address, HTTP_PORT)),
+                self._loop.run_until_complete(asyncio.start_server(
+                    lambda reader, writer: self.handle(reader, writer, True), self.address, HTTPS_PORT,
+                    ssl=self.ssl_context)),
+            ]
+        except OSError as e:
+            logging.error(f"Error starting web farm: {e}")
+            self._servers = []
+            self._started.set()
+            return
+        self._started.set()
+        self._loop.run_forever()
+        for server in self._servers:
+            server.close()
+        self._loop.close()
+
+    async def handle(self, reader, writer, secure):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                for _ in range(MAX_REQUEST_LINES):
+                    line = (await reader.readline()).decode("latin-1").rstrip("\r\n")
+                    if not line:
+                        break
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                self.requests += 1
+                host = self.hosts.get(headers.get("host", "").split(":")[0].lower())
+                if host is not None and host.kind == HANG:
+                    await reader.read()
+                    break
+                if host is not None and host.delay:
+                    await asyncio.sleep(host.delay)
+                writer.write(self.respond(host, request_line, secure))
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, ssl.SSLError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def respond(self, host, request_line, secure):
+        path = request_line.decode("latin-1").split(" ")[1] if b" " in request_line else "/"
+        if host is None:
+            return build_response(404, {"Content-Type": "text/plain"}, b"Unknown host")
+        if host.kind == CHALLENGE:
+            return build_response(403, {"Content-Type": "text/html", "cf-mitigated": "challenge"},
+                                  b"<html><body>Checking your browser</body></html>")
+        if host.kind == CROSS_DOMAIN:
+            return build_response(301, {"Location": f"https://{host.target}{path}"})
+        if not secure and host.kind != PLAIN:
+            return build_response(301, {"Location": f"https://{host.name}{path}"})
+        response_headers = {"Content-Type": "text/html; charset=utf-8", **host.headers}
+        if not secure:
+            response_headers.pop("Strict-Transport-Security", None)
+        return build_response(200, response_headers, BODY)
+
+
+def build_response(status, headers, body=b""):
+    reasons = {200: "OK", 301: "Moved Permanently", 403: "Forbidden", 404: "Not Found"}
+    lines = [f"HTTP/1.1 {status} {reasons.get(status, 'Unknown')}", f"Content-Length: {len(body)}"]
+    lines.extend(f"{name}: {value}" for name, value in headers.items())
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
@@ -1,3 +1,5 @@
+from src.scanner.policies import grade_csp, grade_hsts, grade_referrer_policy, grade_set_cookie
+
 EXPECTED_HEADERS_KEY = "expected_headers"
 DEPRECATED_HEADERS = "deprecated_headers"
 HEADERS_MULTIPLIERS = "header_multipliers"
@@ -21,64 +23,28 @@ config = {
         {"fr": "fr;en;q=0.6"},
         {"it": "it;en;q=0.6"},
     ],
+    # Heuristics receive the header value already lower-cased (see src/scanner/grader.py). Structured policies are
+    # graded on their parsed form (see src/scanner/policies.py).
     EXPECTED_HEADERS_KEY: {
-        "X-XSS-Protection": lambda value: "Strong" if "1; mode=block" in value.lower() else "Weak",
-        "X-Frame-Options": lambda value: "Strong" if value.lower() in ["deny", "sameorigin"] else "Weak",
-        "X-Content-Type-Options": lambda value: "Strong" if value.lower() == "nosniff" else "Weak",
-        "Referrer-Policy": lambda value: (
-            "Strong" if (
-                    value.lower() in ["no-referrer", "same-origin", "strict-origin-when-cross-origin"]
-            )
-            else "Weak"
-        ),
+        "X-XSS-Protection": lambda value: "Strong" if "1; mode=block" in value else "Weak",
+        "X-Frame-Options": lambda value: "Strong" if value in ["deny", "sameorigin"] else "Weak",
+        "X-Content-Type-Options": lambda value: "Strong" if value == "nosniff" else "Weak",
+        "Referrer-Policy": grade_referrer_policy,
         "Access-Control-Allow-Origin": lambda value: (
             "Weak" if (
-                    "*" in value.lower() or "null" in value.lower()
+                    "*" in value or "null" in value
             )
             else "Strong"
         ),
-        "Strict-Transport-Security": lambda value: (
-            "Strong" if (
-                    "max-age=" in value.lower()
-                    and int(value.lower().split('max-age=')[1].split(';')[0].strip().replace("\x93", "").replace(",",
-                                                                                                                 "")) >= 31536000
-                    and ("includesubdomains" in value.lower()
-                         or ("includesubdomains" in value.lower() and "preload" in value.lower()))
-            )
-            else "Weak"
-        ),
-        "Content-Security-Policy": lambda value: (
-            "Strong" if (
-                    "default-src 'self'" in value.lower()
-                    and "form-action 'self'" in value.lower()
-                    and "object-src 'none'" in value.lower()
-                    and "upgrade-insecure-requests" in value.lower()
-                    and "block-all-mixed-content" in value.lower()
-                    and "unsafe-eval" not in value.lower()
-                    and (
-                            "unsafe-inline" not in value.lower()
-                            or "nonce-" in value.lower()
-                            or "hash-" in value.lower()
-                    )
-                    and value.lower() in ["frame-ancestors 'self'", "frame-ancestors 'none'"]
-                    and "https://*" not in value.lower()
-            )
-            else "Weak"
-        ),
-        "cross-origin-resource-policy": lambda value: "Strong" if value.lower() in ["same-origin",
-                                                                                    "same-site"] else "Weak",
-        "cross-origin-embedder-policy": lambda value: "Strong" if value.lower() in ["require-corp",
-                                                                                    "credentialless"] else "Weak",
+        "Strict-Transport-Security": grade_hsts,
+        "Content-Security-Policy": grade_csp,
+        "cross-origin-resource-policy": lambda value: "Strong" if value in ["same-origin", "same-site"] else "Weak",
+        "cross-origin-embedder-policy": lambda value: "Strong" if value in ["require-corp",
+                                                                           "credentialless"] else "Weak",
         "cross-origin-opener-policy": lambda value: "Strong" if (
-                value.lower() in ["same-origin", "same-origin-allow-popups"]
+                value in ["same-origin", "same-origin-allow-popups"]
         ) else "Weak",
-        "Set-Cookie": lambda value: (
-            "Strong" if (
-                    "secure" in value.lower() and
-                    ("samesite=strict" in value.lower() or "samesite=lax" in value.lower()) and
-                    "httponly" in value.lower()
-            ) else "Weak"
-        ),
+        "Set-Cookie": grade_set_cookie,
     },
     DEPRECATED_HEADERS: ["X-XSS-Protection", "X-Frame-Options"],
     CRITICAL_HEADERS: ["Strict-Transport-Security", "Content-Security-Policy"],
@@ -90,9 +56,68 @@ config = {
         "cross-origin-opener-policy": 1.3,
     },
     "timeout": 90,
+    "scan_engine": "probe",
+    "scan_profile": "full",
+    "browser_mode": "per_platform",
+    "probe_timeout": 15,
+    "client_redirect_settle": 1,
+    "connect_timeout": 5,
+    "row_deadline": 240,
+    "scan_cache_ttl": 86400,
+    "scan_cache_memory_size": 1024,
+    "timing_smoothing": 0.5,
+    "metrics_interval": 15,
+    "grade_cache_size": 8192,
     "max_threads": 4,
+    "max_in_flight": 32,
+    "concurrency": {
+        "initial_workers": 4,
+        "min_workers": 2,
+        "max_workers": 24,
+        "interval": 30,
+        "min_samples": 10,
+        "window": 200,
+        "min_available_memory": 0.15,
+        "max_load_per_cpu": 1.5,
+        "latency_p95_target": 60,
+        "max_failure_rate": 0.2,
+        "decrease_factor": 0.7,
+    },
+    "max_deferred": 64,
+    "rate_limits": {
+        "domain": {"rate": 0.5, "burst": 4},
+        "ip": {"rate": 2.0, "burst": 8},
+    },
+    "csv_chunk_size": 1000,
+    "result_batch_size": 20,
+    "result_store": "sqlite",
+    "parquet_batch_size": 500,
+    "result_write_timeout": 300,
+    "driver_max_pages": 50,
+    "driver_max_idle": 8,
+    "driver_max_rss_mb": 1536,
+    "driver_max_lease": 300,
+    "driver_quit_timeout": 10,
+    "watchdog_interval": 30,
+    "reap_orphans": True,
+    "orphan_grace_period": 120,
     "basic_point_unit": 10,
+    "retry_policy": {
+        "timeout": {"max_retries": 3, "backoff": 30, "max_backoff": 300},
+        "driver_crash": {"max_retries": 3, "backoff": 5, "max_backoff": 60},
+        "bot_block": {"max_retries": 2, "backoff": 120, "max_backoff": 600},
+        "connection": {"max_retries": 1, "backoff": 60},
+        "other": {"max_retries": 1, "backoff": 30},
+        "dns": {"max_retries": 0},
+        "tls": {"max_retries": 0},
+        "unreachable": {"max_retries": 0},
+    },
     "dns_server": "8.8.8.8",
+    "dns_concurrency": 64,
+    "dns_timeout": 5,
+    "dns_cache_ttl": 3600,
+    "dns_negative_ttl": 900,
+    "dns_cache_size": 10000,
 }
 
 
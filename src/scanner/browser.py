@@ -1,75 +1,166 @@
-import json
+import os
+import tempfile
+import time
 
 from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.chrome.options import Options
 from selenium_stealth import stealth
 from src.config import config
+from src.scanner.capture import capture_document_events, wait_for_document, PERFORMANCE_LOGGING_PREFS
+from src.scanner.metrics import metrics
 from src.scanner.scan_result import ScanResult
 
+FULL_PROFILE = "full"
+HEADERS_ONLY_PROFILE = "headers_only"
+BLOCKED_EXTENSIONS = [
+    "png", "jpg", "jpeg", "gif", "webp", "avif", "svg", "ico", "bmp",
+    "css", "js", "mjs", "woff", "woff2", "ttf", "otf", "eot",
+    "mp4", "webm", "mp3", "ogg", "wav", "pdf", "json", "xml",
+]
+# Patterns match the whole URL, so query strings and fragments need their own patterns. Resources without
+# an extension are not matched here, they are cut off by stopping the page once the document has arrived.
+BLOCKED_RESOURCE_PATTERNS = [f"*.{extension}{suffix}" for extension in BLOCKED_EXTENSIONS
+                             for suffix in ("", "?*", "#*")]
+# Images are blocked by type through content settings, whatever their URL.
+BLOCKED_CONTENT_SETTINGS = {"profile.managed_default_content_settings.images": 2}
+CLIENT_REDIRECT_SETTLE = 1
+# Chrome profiles of this process live here, which also tells our Chrome processes apart from anyone else's.
+PROFILE_DIRECTORY = os.path.join(tempfile.gettempdir(), f"security-scanner-{os.getpid()}")
+POLL_INTERVAL = 0.1
 
-def get_webdriver(user_agent, language):
+
+def is_headers_only():
+    return config.get('scan_profile', FULL_PROFILE) == HEADERS_ONLY_PROFILE
+
+
+def is_mobile(user_agent):
+    return "android" in user_agent.lower()
+
+
+def create_profile_directory():
+    os.makedirs(PROFILE_DIRECTORY, exist_ok=True)
+    return tempfile.mkdtemp(dir=PROFILE_DIRECTORY)
+
+
+def get_profile_directory(driver):
+    try:
+        return driver.capabilities["chrome"]["userDataDir"]
+    except (AttributeError, KeyError, TypeError):
+        return None
+
+
+def get_webdriver(user_agent, language, shared=False):
     arguments = ["--headless", f"user-agent={user_agent}", f"accept-language={language}", f"--lang={language}",
                  "--no-sandbox", "--disable-dev-shm-usage", "--disable-blink-features=AutomationControlled",
-                 f"--dns-server={config.get("dns_server", "1.1.1.1")}", "--ignore-certificate-errors",
-                 "--ignore-certificate-errors-spki-list", "--ignore-ssl-errors=yes"]
+                 f"--dns-server={config.get('dns_server', '1.1.1.1')}", "--ignore-certificate-errors",
+                 "--ignore-certificate-errors-spki-list", "--ignore-ssl-errors=yes",
+                 f"--user-data-dir={create_profile_directory()}"]
     options = Options()
     for arg in arguments:
         options.add_argument(arg)
-    if "android" in user_agent.lower():
+    if is_mobile(user_agent) and not shared:
         options.add_experimental_option("mobileEmulation", {"deviceName": "Nexus 5"})
 
+    if is_headers_only() or shared:
+        options.page_load_strategy = "none"
+    if is_headers_only():
+        options.add_experimental_option("prefs", BLOCKED_CONTENT_SETTINGS)
+
     options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
-    driver = webdriver.Chrome(options=options)
+    options.add_experimental_option("perfLoggingPrefs", PERFORMANCE_LOGGING_PREFS)
+    with metrics.timer("driver_launch"):
+        driver = webdriver.Chrome(options=options)
     driver.set_page_load_timeout(config.get('timeout', 60))
     driver.execute_cdp_cmd("Network.setCacheDisabled", {"cacheDisabled": True})
     driver.execute_cdp_cmd("Network.enable", {})
+    if is_headers_only():
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_RESOURCE_PATTERNS})
     driver.execute_cdp_cmd("Network.setExtraHTTPHeaders", {
         "headers": {
             "Accept-Language": language
         }
     })
-    driver.implicitly_wait(10)
-
-    stealth(driver,
-            languages=[language],
-            vendor="Google Inc.",
-            platform="Win64" if "android" not in user_agent.lower() else "Android",
-            webgl_vendor="Intel Inc.",
-            renderer="Intel Iris OpenGL Engine",
-            fix_hairline=True,
-            )
+    if shared:
+        # Platform emulation and stealth are applied per browser context (see contexts.py).
+        return driver
+
+    with metrics.timer("stealth"):
+        stealth(driver,
+                languages=[language],
+                vendor="Google Inc.",
+                platform="Win64" if not is_mobile(user_agent) else "Android",
+                webgl_vendor="Intel Inc.",
+                renderer="Intel Iris OpenGL Engine",
+                fix_hairline=True,
+                )
     return driver
 
 
+def scan_url(web_driver, url, timeout=None, escalated=False):
+    # An escalated probe saw a challenge or a client-side redirect, so the page has to load and run its scripts.
+    timeout = timeout or config.get('timeout', 60)
+    headers_only = is_headers_only() and not escalated
+    web_driver.set_page_load_timeout(timeout)
+    if is_headers_only():
+        blocked = BLOCKED_RESOURCE_PATTERNS if headers_only else []
+        web_driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": blocked})
+    with metrics.timer("navigation"):
+        web_driver.get(url)
+        if headers_only:
+            capture = wait_for_document(web_driver, timeout)
+            # Everything the document requested in the meantime is cancelled, whatever its type or URL.
+            web_driver.execute_cdp_cmd("Page.stopLoading", {})
+            return build_scan_result(capture.events, capture.final_url)
+        if is_headers_only():
+            wait_for_load(web_driver, timeout)
+    return get_scan_result(web_driver)
+
+
+def wait_for_load(web_driver, timeout, settle=None):
+    # The page load strategy of headers-only drivers is "none", wait for the load and any client-side redirect.
+    settle = settle if settle is not None else config.get('client_redirect_settle', CLIENT_REDIRECT_SETTLE)
+    deadline = time.monotonic() + timeout
+    url, stable_since = None, time.monotonic()
+    while time.monotonic() < deadline:
+        try:
+            ready = web_driver.execute_script("return document.readyState") == "complete"
+            current_url = web_driver.current_url
+        except WebDriverException:
+            ready, current_url = False, None
+        if current_url != url:
+            url, stable_since = current_url, time.monotonic()
+        elif ready and time.monotonic() - stable_since >= settle:
+            return
+        time.sleep(POLL_INTERVAL)
+    raise TimeoutException(f"Timed out waiting for the page to load after {timeout}s")
+
+
 def get_scan_result(web_driver):
-    logs = web_driver.get_log("performance")
+    with metrics.timer("log_parsing"):
+        final_url = web_driver.current_url
+        return build_scan_result(capture_document_events(web_driver, final_url), final_url)
+
+
+def build_scan_result(events, final_url):
     headers = {}
     protocol = "Unknown"
     initial_status = None
     final_status = None
     redirect_count = 0
-    final_url = web_driver.current_url
-    for entry in logs:
-        log = entry['message']
-        message_data = json.loads(log)['message']
-        if 'Network.requestWillBeSent' in message_data['method']:
-            redirect_response = message_data['params'].get('redirectResponse', {})
-            if redirect_response:
-                redirect_status = redirect_response.get('status')
-                if 300 <= redirect_status < 400:
-                    redirect_count += 1
-                    if initial_status is None:
-                        initial_status = redirect_status
-        if 'Network.responseReceived' in message_data['method']:
-            response_data = message_data['params'].get('response', {})
-            if response_data and response_data.get('url', '') == final_url:
-                headers = response_data.get('headers', {})
-                protocol = response_data.get('protocol', "Unknown")
-                final_status = response_data.get('status', None)
-
+    for event in events:
+        if event.kind == "request" and event.status is not None:
+            if 300 <= event.status < 400:
+                redirect_count += 1
                 if initial_status is None:
-                    initial_status = final_status
-    final_url = web_driver.current_url
+                    initial_status = event.status
+        if event.kind == "response" and event.url == final_url:
+            headers = event.headers
+            protocol = event.protocol or "Unknown"
+            final_status = event.status
+
+            if initial_status is None:
+                initial_status = final_status
     return ScanResult(
         initial_status=initial_status,
         final_status=final_status,
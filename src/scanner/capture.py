@@ -0,0 +1,111 @@
+import json
+import re
+import time
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+REQUEST_WILL_BE_SENT = "Network.requestWillBeSent"
+RESPONSE_RECEIVED = "Network.responseReceived"
+LOADING_FAILED = "Network.loadingFailed"
+DOCUMENT_MARKER = '"type":"Document"'
+PERFORMANCE_LOGGING_PREFS = {"enableNetwork": True, "enablePage": False}
+WEBVIEW_PATTERN = re.compile(r'"webview":"([^"]*)"')
+
+
+class DocumentEvent:
+    __slots__ = ("kind", "url", "status", "protocol", "headers")
+
+    def __init__(self, kind, url, status=None, protocol=None, headers=None):
+        self.kind = kind
+        self.url = url
+        self.status = status
+        self.protocol = protocol
+        self.headers = headers
+
+    def __repr__(self):
+        return f"DocumentEvent(kind={self.kind}, url={self.url}, status={self.status})"
+
+
+class DocumentCapture:
+    def __init__(self, final_url=None):
+        self.final_url = final_url
+        self.events = []
+        self.main_frame_id = None
+        self.main_request_id = None
+        self.complete = False
+        self.error = None
+
+    def feed(self, entries):
+        for entry in entries:
+            if self.complete:
+                break
+            log = entry['message']
+            # Cheap substring checks so only main document events are JSON decoded.
+            if DOCUMENT_MARKER not in log:
+                continue
+            if REQUEST_WILL_BE_SENT in log:
+                self._on_request(json.loads(log)['message']['params'])
+            elif RESPONSE_RECEIVED in log:
+                self._on_response(json.loads(log)['message']['params'])
+            elif LOADING_FAILED in log:
+                self._on_failure(json.loads(log)['message']['params'])
+        return self.complete
+
+    def _is_main_document(self, params):
+        return (params.get('type') == "Document" and params.get('requestId') == params.get('loaderId')
+                and params.get('frameId') == self.main_frame_id)
+
+    def _on_request(self, params):
+        if self.main_frame_id is None and params.get('type') == "Document":
+            self.main_frame_id = params.get('frameId')
+        if not self._is_main_document(params):
+            return
+        self.main_request_id = params.get('requestId')
+        redirect_response = params.get('redirectResponse') or {}
+        self.events.append(DocumentEvent("request", params['request']['url'], redirect_response.get('status')))
+
+    def _on_response(self, params):
+        if not self._is_main_document(params):
+            return
+        response_data = params.get('response') or {}
+        url = response_data.get('url', '')
+        self.events.append(DocumentEvent("response", url, response_data.get('status'),
+                                         response_data.get('protocol'), response_data.get('headers', {})))
+        if self.final_url is None or url == self.final_url:
+            self.final_url = url
+            self.complete = True
+
+    def _on_failure(self, params):
+        if self.main_request_id is not None and params.get('requestId') == self.main_request_id:
+            self.error = params.get('errorText', "net::ERR_FAILED")
+            self.complete = True
+
+
+def split_by_webview(entries):
+    groups = {}
+    for entry in entries:
+        log = entry['message']
+        if DOCUMENT_MARKER not in log:
+            continue
+        match = WEBVIEW_PATTERN.search(log, log.rfind('"webview":'))
+        webview = match.group(1).removeprefix("CDwindow-") if match else None
+        groups.setdefault(webview, []).append(entry)
+    return groups
+
+
+def capture_document_events(web_driver, final_url):
+    capture = DocumentCapture(final_url)
+    capture.feed(web_driver.get_log("performance"))
+    return capture.events
+
+
+def wait_for_document(web_driver, timeout, poll_interval=0.1):
+    capture = DocumentCapture()
+    deadline = time.monotonic() + timeout
+    while not capture.feed(web_driver.get_log("performance")):
+        if time.monotonic() >= deadline:
+            raise TimeoutException(f"Timed out waiting for the document response after {timeout}s")
+        time.sleep(poll_interval)
+    if capture.error:
+        raise WebDriverException(f"unknown error: {capture.error}")
+    return capture
@@ -0,0 +1,47 @@
+import os
+import threading
+
+JOURNAL_DIRECTORY = os.path.join('.', 'src', 'data', 'results', 'journal')
+SEPARATOR = "\t"
+
+
+class Journal:
+    def __init__(self, name, directory=JOURNAL_DIRECTORY):
+        self.path = os.path.join(directory, f"{name}.journal")
+        self.lock = threading.Lock()
+        self.completed = self._read()
+
+    def _read(self):
+        completed = set()
+        if not os.path.exists(self.path):
+            return completed
+        with open(self.path, mode='r', encoding='utf-8') as journal:
+            for line in journal:
+                if not line.endswith("\n") or SEPARATOR not in line:
+                    continue  # Torn write from an interrupted run
+                key, platform = line.rstrip("\n").rsplit(SEPARATOR, 1)
+                completed.add((key, platform))
+        return completed
+
+    def is_completed(self, key, platform):
+        return (str(key), platform) in self.completed
+
+    def record(self, pairs):
+        pairs = [(str(key), platform) for key, platform in pairs]
+        if not pairs:
+            return
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, mode='a', encoding='utf-8') as journal:
+                journal.writelines(f"{key}{SEPARATOR}{platform}\n" for key, platform in pairs)
+                journal.flush()
+                os.fsync(journal.fileno())
+            self.completed.update(pairs)
+
+    def clear(self):
+        with self.lock:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self.completed.clear()
@@ -0,0 +1,82 @@
+import logging
+import os
+import time
+from collections import deque
+
+from src.config import config
+
+MEMINFO_PATH = "/proc/meminfo"
+
+
+class ConcurrencyController:
+    def __init__(self, settings=None):
+        settings = settings if settings is not None else config.get('concurrency', {})
+        initial_workers = settings.get("initial_workers", config.get('max_threads', 5))
+        self.min_workers = settings.get("min_workers", initial_workers)
+        self.max_workers = max(settings.get("max_workers", initial_workers), self.min_workers)
+        self.limit = min(max(initial_workers, self.min_workers), self.max_workers)
+        self.interval = settings.get("interval", 30)
+        self.min_samples = settings.get("min_samples", 10)
+        self.min_available_memory = settings.get("min_available_memory", 0.15)
+        self.max_load_per_cpu = settings.get("max_load_per_cpu", 1.5)
+        self.latency_p95_target = settings.get("latency_p95_target", 60)
+        self.max_failure_rate = settings.get("max_failure_rate", 0.2)
+        self.decrease_factor = settings.get("decrease_factor", 0.7)
+        self._samples = deque(maxlen=settings.get("window", 200))
+        self._last_adjustment = time.monotonic()
+
+    def record(self, duration, failed=False):
+        self._samples.append((duration, failed))
+
+    def adjust(self):
+        now = time.monotonic()
+        if self.min_workers == self.max_workers or now - self._last_adjustment < self.interval:
+            return self.limit
+        self._last_adjustment = now
+
+        pressure = self.get_pressure()
+        previous = self.limit
+        if pressure:
+            self.limit = max(self.min_workers, int(self.limit * self.decrease_factor))
+        elif len(self._samples) >= self.min_samples:
+            self.limit = min(self.max_workers, self.limit + 1)
+        self._samples.clear()
+
+        if self.limit != previous:
+            logging.info(f"Concurrency {previous} -> {self.limit}" + (f" ({pressure})" if pressure else ""))
+        return self.limit
+
+    def get_pressure(self):
+        available_memory = get_available_memory()
+        if available_memory is not None and available_memory < self.min_available_memory:
+            return f"available memory {available_memory:.0%}"
+
+        load_per_cpu = get_load_per_cpu()
+        if load_per_cpu is not None and load_per_cpu > self.max_load_per_cpu:
+            return f"load {load_per_cpu:.2f} per CPU"
+
+        if len(self._samples) >= self.min_samples:
+            durations = sorted(duration for duration, _ in self._samples)
+            p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+            if p95 > self.latency_p95_target:
+                return f"p95 latency {p95:.1f}s"
+            failure_rate = sum(failed for _, failed in self._samples) / len(self._samples)
+            if failure_rate > self.max_failure_rate:
+                return f"failure rate {failure_rate:.0%}"
+        return None
+
+
+def get_available_memory():
+    try:
+        with open(MEMINFO_PATH, encoding='utf-8') as meminfo:
+            values = {line.split(":")[0]: int(line.split()[1]) for line in meminfo if ":" in line}
+        return values["MemAvailable"] / values["MemTotal"]
+    except (OSError, KeyError, ValueError, ZeroDivisionError):
+        return None
+
+
+def get_load_per_cpu():
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except OSError:
+        return None
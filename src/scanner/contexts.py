@@ -0,0 +1,103 @@
+import logging
+import time
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium_stealth import stealth
+
+from src.config import config
+from src.scanner.browser import build_scan_result, is_headers_only, is_mobile, BLOCKED_RESOURCE_PATTERNS
+from src.scanner.capture import DocumentCapture, split_by_webview
+from src.scanner.metrics import metrics
+
+DESKTOP_METRICS = {"width": 1920, "height": 1080, "deviceScaleFactor": 1, "mobile": False}
+MOBILE_METRICS = {"width": 360, "height": 640, "deviceScaleFactor": 3, "mobile": True}
+POLL_INTERVAL = 0.1
+
+
+class PlatformTab:
+    def __init__(self, platform, context_id, target_id):
+        self.platform = platform
+        self.context_id = context_id
+        self.target_id = target_id
+        self.capture = DocumentCapture()
+
+    def __repr__(self):
+        return f"PlatformTab(platform={self.platform}, target={self.target_id})"
+
+
+def open_tab(web_driver, platform, user_agent, language):
+    context_id = web_driver.execute_cdp_cmd("Target.createBrowserContext", {"disposeOnDetach": True})[
+        "browserContextId"]
+    target_id = web_driver.execute_cdp_cmd("Target.createTarget", {
+        "url": "about:blank",
+        "browserContextId": context_id
+    })["targetId"]
+    web_driver.switch_to.window(target_id)
+    configure_tab(web_driver, user_agent, language)
+    return PlatformTab(platform, context_id, target_id)
+
+
+def configure_tab(web_driver, user_agent, language):
+    mobile = is_mobile(user_agent)
+    web_driver.execute_cdp_cmd("Network.enable", {})
+    web_driver.execute_cdp_cmd("Network.setCacheDisabled", {"cacheDisabled": True})
+    web_driver.execute_cdp_cmd("Network.setExtraHTTPHeaders", {"headers": {"Accept-Language": language}})
+    if is_headers_only():
+        web_driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_RESOURCE_PATTERNS})
+    with metrics.timer("stealth"):
+        stealth(web_driver,
+                user_agent=user_agent,
+                languages=[language],
+                vendor="Google Inc.",
+                platform="Android" if mobile else "Win64",
+                webgl_vendor="Intel Inc.",
+                renderer="Intel Iris OpenGL Engine",
+                fix_hairline=True,
+                )
+    web_driver.execute_cdp_cmd("Emulation.setDeviceMetricsOverride", MOBILE_METRICS if mobile else DESKTOP_METRICS)
+    if mobile:
+        web_driver.execute_cdp_cmd("Emulation.setTouchEmulationEnabled", {"enabled": True, "maxTouchPoints": 5})
+
+
+def close_tab(web_driver, tab):
+    try:
+        web_driver.execute_cdp_cmd("Target.closeTarget", {"targetId": tab.target_id})
+        web_driver.execute_cdp_cmd("Target.disposeBrowserContext", {"browserContextId": tab.context_id})
+    except WebDriverException as e:
+        logging.warning(f"Error closing browser context of {tab}: {e}")
+
+
+def browse_tabs(web_driver, url, devices, language, timeout=None):
+    base_handle = web_driver.current_window_handle
+    tabs = {}
+    try:
+        for platform, user_agent in devices:
+            tab = open_tab(web_driver, platform, user_agent, language)
+            tabs[tab.target_id] = tab
+        web_driver.get_log("performance")
+
+        with metrics.timer("navigation"):
+            for tab in tabs.values():
+                web_driver.switch_to.window(tab.target_id)
+                web_driver.get(url)
+
+            deadline = time.monotonic() + (timeout or config.get('timeout', 60))
+            while not all(tab.capture.complete for tab in tabs.values()) and time.monotonic() < deadline:
+                for webview, entries in split_by_webview(web_driver.get_log("performance")).items():
+                    if webview in tabs:
+                        tabs[webview].capture.feed(entries)
+                time.sleep(POLL_INTERVAL)
+
+        results = {}
+        for tab in tabs.values():
+            if not tab.capture.complete:
+                results[tab.platform] = TimeoutException(f"Timed out waiting for the document response of {url}")
+            elif tab.capture.error:
+                results[tab.platform] = WebDriverException(f"unknown error: {tab.capture.error}")
+            else:
+                results[tab.platform] = build_scan_result(tab.capture.events, tab.capture.final_url)
+        return results
+    finally:
+        for tab in tabs.values():
+            close_tab(web_driver, tab)
+        web_driver.switch_to.window(base_handle)
@@ -0,0 +1,211 @@
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from selenium.common.exceptions import WebDriverException
+
+from src.config import config
+from src.scanner.browser import PROFILE_DIRECTORY, get_profile_directory, get_webdriver
+from src.scanner.contexts import close_tab, open_tab
+from src.scanner.utils.process import get_descendants, is_running, kill_processes, kill_tree
+
+BLANK_PAGE = "about:blank"
+
+
+class PooledDriver:
+    def __init__(self, key, driver):
+        self.key = key
+        self.driver = driver
+        self.pid = get_service_pid(driver)
+        self.pages = 0
+        self.leased_at = None
+        self.killed = None
+
+    def __repr__(self):
+        return f"PooledDriver(key={self.key}, pages={self.pages})"
+
+
+class DriverPool:
+    def __init__(self, max_pages=None, max_idle=None):
+        self.max_pages = max_pages or config.get('driver_max_pages', 50)
+        self.max_idle = max_idle or config.get('driver_max_idle', 8)
+        self._idle = []
+        self._leased = set()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @contextmanager
+    def lease(self, user_agent, language, shared=False):
+        pooled = self._acquire((user_agent, language, shared))
+        try:
+            # Shared drivers already scan in a browser context of their own (see contexts.py).
+            context = None if shared else open_context(pooled.driver, user_agent, language)
+            try:
+                yield pooled.driver
+            finally:
+                if context is not None:
+                    close_context(pooled.driver, context)
+        except Exception:
+            if pooled.killed is None and is_alive(pooled.driver):
+                self._release(pooled)
+            else:
+                logging.warning(f"WebDriver crashed, discarding it: {pooled}")
+                self._discard(pooled)
+            raise
+        else:
+            self._release(pooled)
+
+    def drivers(self):
+        with self._lock:
+            return self._idle + list(self._leased)
+
+    def kill(self, pooled, reason):
+        # A leased driver stays leased, its scan fails and the lease discards it; the next lease starts a fresh one.
+        logging.warning(f"Killing WebDriver ({reason}): {pooled}")
+        with self._lock:
+            pooled.killed = reason
+            if pooled in self._idle:
+                self._idle.remove(pooled)
+        if pooled.pid is not None:
+            kill_tree(pooled.pid)
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            drivers = self._idle + list(self._leased)
+            self._idle = []
+            self._leased.clear()
+        for pooled in drivers:
+            quit_driver(pooled.driver)
+        shutil.rmtree(PROFILE_DIRECTORY, ignore_errors=True)
+
+    def _acquire(self, key):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("WebDriver pool is shut down.")
+            for index in range(len(self._idle) - 1, -1, -1):
+                if self._idle[index].key == key:
+                    pooled = self._idle.pop(index)
+                    pooled.leased_at = time.monotonic()
+                    self._leased.add(pooled)
+                    return pooled
+
+        pooled = PooledDriver(key, get_webdriver(*key))
+        with self._lock:
+            if self._closed:
+                quit_driver(pooled.driver)
+                raise RuntimeError("WebDriver pool is shut down.")
+            pooled.leased_at = time.monotonic()
+            self._leased.add(pooled)
+        return pooled
+
+    def _release(self, pooled):
+        pooled.pages += 1
+        pooled.leased_at = None
+        if pooled.killed is not None:
+            self._discard(pooled)
+            return
+        if pooled.pages >= self.max_pages:
+            logging.info(f"Recycling WebDriver after {pooled.pages} pages: {pooled}")
+            self._discard(pooled)
+            return
+        try:
+            reset_driver(pooled.driver)
+        except Exception as e:
+            logging.warning(f"Error resetting WebDriver, discarding it: {e}")
+            self._discard(pooled)
+            return
+
+        evicted = None
+        with self._lock:
+            self._leased.discard(pooled)
+            if self._closed:
+                evicted = pooled
+            else:
+                self._idle.append(pooled)
+                if len(self._idle) > self.max_idle:
+                    evicted = self._idle.pop(0)
+        if evicted is not None:
+            quit_driver(evicted.driver)
+
+    def _discard(self, pooled):
+        with self._lock:
+            self._leased.discard(pooled)
+        quit_driver(pooled.driver)
+
+
+def open_context(driver, user_agent, language):
+    # Chrome keeps dynamic HSTS state per browser context and no CDP call clears it, so every lease gets
+    # a fresh context; otherwise an http:// URL of a host seen earlier is upgraded with an internal 307.
+    base_handle = driver.current_window_handle
+    tab = open_tab(driver, None, user_agent, language)
+    driver.get_log("performance")
+    return base_handle, tab
+
+
+def close_context(driver, context):
+    base_handle, tab = context
+    close_tab(driver, tab)
+    driver.switch_to.window(base_handle)
+
+
+def reset_driver(driver):
+    origin = get_origin(driver.current_url)
+    driver.get(BLANK_PAGE)
+    if origin:
+        driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+    driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+    driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+    driver.get_log("performance")
+
+
+def get_origin(url):
+    parsed_url = urlparse(url or "")
+    if parsed_url.scheme not in ("http", "https"):
+        return None
+    return f"{parsed_url.scheme}://{parsed_url.netloc}"
+
+
+def is_alive(driver):
+    try:
+        driver.window_handles
+        return True
+    except WebDriverException:
+        return False
+
+
+def get_service_pid(driver):
+    try:
+        return driver.service.process.pid
+    except AttributeError:
+        return None
+
+
+def quit_driver(driver, timeout=None):
+    timeout = timeout or config.get('driver_quit_timeout', 10)
+    pid = get_service_pid(driver)
+    processes = [pid, *get_descendants(pid)] if pid is not None else []
+    profile_directory = get_profile_directory(driver)
+
+    thread = threading.Thread(target=close_driver, args=(driver,), name="webdriver-quit", daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        logging.warning(f"WebDriver did not quit within {timeout}s, killing its processes.")
+    # quit() leaves renderers behind when chromedriver already crashed.
+    leftovers = [process for process in processes if is_running(process)]
+    if leftovers:
+        kill_processes(leftovers)
+    if profile_directory and os.path.dirname(profile_directory) == PROFILE_DIRECTORY:
+        shutil.rmtree(profile_directory, ignore_errors=True)
+
+
+def close_driver(driver):
+    try:
+        driver.quit()
+    except Exception as e:
+        logging.error(f"Error quitting WebDriver: {e}")
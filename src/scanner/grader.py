@@ -0,0 +1,78 @@
+import ast
+import json
+from functools import lru_cache
+
+import pandas as pd
+
+from src.config import config, EXPECTED_HEADERS_KEY
+
+MISSING = "Missing"
+
+
+def dump_headers(headers):
+    return json.dumps(dict(headers), ensure_ascii=False, separators=(",", ":"))
+
+
+def load_headers(value):
+    # Results scanned before raw headers were stored as JSON hold a Python dict repr.
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        headers = json.loads(value)
+    except ValueError:
+        try:
+            headers = ast.literal_eval(value)
+        except (ValueError, SyntaxError, MemoryError, RecursionError):
+            return None
+    return headers if isinstance(headers, dict) else None
+
+
+class HeaderGrader:
+    def __init__(self, heuristics=None, cache_size=None):
+        heuristics = heuristics if heuristics is not None else config[EXPECTED_HEADERS_KEY]
+        self.heuristics = {header.lower(): heuristic for header, heuristic in heuristics.items()}
+        # Many sites share the exact header values of their CDN or framework.
+        self.grade = lru_cache(maxsize=cache_size or config.get('grade_cache_size', 8192))(self._grade)
+
+    def _grade(self, header, value):
+        return self.heuristics[header](value.lower())
+
+    def assess(self, received_headers):
+        analysis = {}
+        normalized_received_headers = {k.lower(): v for k, v in received_headers.items()}
+
+        for expected_header in self.heuristics:
+            received_header = normalized_received_headers.get(expected_header, MISSING)
+            analysis[f"{expected_header}_presence"] = received_header != MISSING
+
+            if received_header != MISSING:
+                analysis[f"{expected_header}_config"] = self.grade(expected_header, received_header)
+            else:
+                analysis[f"{expected_header}_config"] = MISSING
+
+        analysis['raw_headers'] = dump_headers(received_headers)
+
+        return analysis
+
+    def grade_column(self, header, values):
+        header = header.lower()
+        present = values.notna() & (values != MISSING)
+        grades = {value: self.grade(header, str(value)) for value in values[present].unique()}
+        return values.map(grades).where(present, MISSING)
+
+    def grade_frame(self, frame):
+        # frame holds one column of raw values per expected header, missing headers as NaN.
+        columns = {header.lower(): header for header in frame.columns}
+        analysis = {}
+        for expected_header in self.heuristics:
+            if expected_header in columns:
+                values = frame[columns[expected_header]]
+                analysis[f"{expected_header}_presence"] = values.notna() & (values != MISSING)
+                analysis[f"{expected_header}_config"] = self.grade_column(expected_header, values)
+            else:
+                analysis[f"{expected_header}_presence"] = pd.Series(False, index=frame.index)
+                analysis[f"{expected_header}_config"] = pd.Series(MISSING, index=frame.index)
+        return pd.DataFrame(analysis, index=frame.index)
+
+
+grader = HeaderGrader()
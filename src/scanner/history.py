@@ -0,0 +1,69 @@
+import os
+import threading
+
+import pandas as pd
+
+from src.config import config
+
+HISTORY_PATH = os.path.join('.', 'src', 'data', 'results', 'history', 'scan_timings.tsv')
+SEPARATOR = "\t"
+SUCCESS = "ok"
+
+
+class TimingHistory:
+    def __init__(self, path=HISTORY_PATH, smoothing=None):
+        self.path = path
+        self.smoothing = smoothing or config.get('timing_smoothing', 0.5)
+        self.lock = threading.Lock()
+        self.expected = self._read()
+
+    def _read(self):
+        expected = {}
+        if not os.path.exists(self.path):
+            return expected
+        with open(self.path, mode='r', encoding='utf-8') as history:
+            for line in history:
+                fields = line.rstrip("\n").split(SEPARATOR)
+                if not line.endswith("\n") or len(fields) != 4:
+                    continue  # Torn write from an interrupted run
+                _, domain, duration, _ = fields
+                try:
+                    expected[domain] = self._smooth(expected.get(domain), float(duration))
+                except ValueError:
+                    continue
+        return expected
+
+    def _smooth(self, previous, duration):
+        if previous is None:
+            return duration
+        return self.smoothing * duration + (1 - self.smoothing) * previous
+
+    def expected_duration(self, domain):
+        return self.expected.get(domain)
+
+    def record(self, domain, duration, outcome=SUCCESS):
+        line = SEPARATOR.join([pd.Timestamp.now().isoformat(), domain, f"{duration:.3f}", outcome])
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, mode='a', encoding='utf-8') as history:
+                history.write(f"{line}\n")
+            self.expected[domain] = self._smooth(self.expected.get(domain), duration)
+
+
+def order_by_expected_duration(items, expected_duration):
+    # Longest expected scans go first; unknown domains are spread evenly between them.
+    durations = [(item, expected_duration(item)) for item in items]
+    known = [item for item, _ in sorted(((item, duration) for item, duration in durations if duration is not None),
+                                        key=lambda pair: pair[1], reverse=True)]
+    unknown = [item for item, duration in durations if duration is None]
+    ordered = []
+    known_index = unknown_index = 0
+    while known_index < len(known) or unknown_index < len(unknown):
+        if unknown_index < len(unknown) and (
+                known_index >= len(known) or unknown_index * len(known) <= known_index * len(unknown)):
+            ordered.append(unknown[unknown_index])
+            unknown_index += 1
+        else:
+            ordered.append(known[known_index])
+            known_index += 1
+    return ordered
@@ -0,0 +1,178 @@
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import pandas as pd
+
+from src.config import config
+
+METRICS_DIRECTORY = os.path.join('.', 'src', 'data', 'results', 'metrics')
+PROMETHEUS_FILENAME = "scanner.prom"
+ALL = "all"
+ROW_STAGE = "row"
+DEFAULT_BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300]
+_labels = contextvars.ContextVar("metric_labels", default={})
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        # Interpolated within the bucket, like Prometheus' histogram_quantile.
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - cumulative) / count, self.max)
+            cumulative += count
+        return self.max
+
+
+class Metrics:
+    def __init__(self, directory=METRICS_DIRECTORY, buckets=None):
+        self.directory = directory
+        self.buckets = buckets or config.get('metrics_buckets', DEFAULT_BUCKETS)
+        self._histograms = {}
+        self._counters = Counter()
+        self._gauges = {}
+        self._files = {}
+        self._url_files = set()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def labels(self, **labels):
+        token = _labels.set({**_labels.get(), **labels})
+        try:
+            yield
+        finally:
+            _labels.reset(token)
+
+    @contextmanager
+    def timer(self, stage):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.monotonic() - started)
+
+    def observe(self, stage, duration):
+        labels = _labels.get()
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram(self.buckets)
+            histogram.observe(duration)
+            if "file" not in labels:
+                return
+            # Per-file stages are summarised in histograms and per-URL timings are written out once the row
+            # is done, so memory only holds the rows in flight.
+            file_metrics = self._file(labels["file"])
+            stage_histogram = file_metrics["stages"].get(stage)
+            if stage_histogram is None:
+                stage_histogram = file_metrics["stages"][stage] = Histogram(self.buckets)
+            stage_histogram.observe(duration)
+            url = labels.get("url", ALL)
+            platforms = file_metrics["urls"].setdefault(url, {})
+            stages = platforms.setdefault(labels.get("platform", ALL), {})
+            stages[stage] = stages.get(stage, 0) + duration
+            if stage == ROW_STAGE and url != ALL:
+                self._write_urls(labels["file"], {url: file_metrics["urls"].pop(url)})
+
+    def increment(self, event, value=1):
+        labels = _labels.get()
+        with self._lock:
+            self._counters[event] += value
+            if "file" in labels:
+                self._file(labels["file"])["counters"][event] += value
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def _file(self, filename):
+        return self._files.setdefault(filename, {"stages": {}, "counters": Counter(), "urls": {}})
+
+    def _urls_path(self, filename):
+        return os.path.join(self.directory, f"{os.path.splitext(filename)[0]}_urls.jsonl")
+
+    def _write_urls(self, filename, urls):
+        # A row that is retried gets one line per attempt, the lines of an earlier run are replaced.
+        mode = 'a' if filename in self._url_files else 'w'
+        self._url_files.add(filename)
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._urls_path(filename), mode=mode, encoding='utf-8') as output:
+            for url, platforms in urls.items():
+                timings = {platform: {stage: round(seconds, 4) for stage, seconds in stages.items()}
+                           for platform, stages in platforms.items()}
+                output.write(json.dumps({"url": url, "timings": timings}) + "\n")
+
+    def export_summary(self, filename):
+        with self._lock:
+            file_metrics = self._files.pop(filename, None)
+            if file_metrics is None:
+                return
+            if file_metrics["urls"]:
+                self._write_urls(filename, file_metrics["urls"])
+        summary = pd.DataFrame([{
+            "stage": stage, "count": histogram.count, "total": histogram.sum,
+            "mean": histogram.sum / histogram.count, "p50": histogram.quantile(0.5),
+            "p95": histogram.quantile(0.95), "max": histogram.max,
+        } for stage, histogram in sorted(file_metrics["stages"].items())],
+            columns=["stage", "count", "total", "mean", "p50", "p95", "max"])
+
+        name = os.path.splitext(filename)[0]
+        os.makedirs(self.directory, exist_ok=True)
+        summary.to_csv(os.path.join(self.directory, f"{name}_metrics.csv"), index=False)
+        with open(os.path.join(self.directory, f"{name}_metrics.json"), mode='w', encoding='utf-8') as output:
+            json.dump({"file": filename, "stages": summary.to_dict(orient="records"),
+                       "counters": dict(file_metrics["counters"]),
+                       "urls": os.path.basename(self._urls_path(filename))}, output, indent=2)
+
+    def write_prometheus(self):
+        lines = []
+        with self._lock:
+            lines.append("# HELP scanner_stage_seconds Time spent in each scan stage.")
+            lines.append("# TYPE scanner_stage_seconds histogram")
+            for stage, histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ["+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(f'scanner_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'scanner_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                lines.append(f'scanner_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+            lines.append("# HELP scanner_events_total Scanner events by kind.")
+            lines.append("# TYPE scanner_events_total counter")
+            for event, count in sorted(self._counters.items()):
+                lines.append(f'scanner_events_total{{event="{event}"}} {count}')
+            for name, value in sorted(self._gauges.items()):
+                lines.append(f"# TYPE scanner_{name} gauge")
+                lines.append(f"scanner_{name} {value}")
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, PROMETHEUS_FILENAME)
+        with open(f"{path}.tmp", mode='w', encoding='utf-8') as output:
+            output.write("\n".join(lines) + "\n")
+        os.replace(f"{path}.tmp", path)
+
+
+metrics = Metrics()
@@ -0,0 +1,146 @@
+import re
+from functools import lru_cache
+
+POLICY_CACHE_SIZE = 4096
+POLICY_SEPARATOR = re.compile(r"[,\n]")
+MAX_AGE_PATTERN = re.compile(r"""max-age\s*=\s*["'\u201c\u201d\x93\x94]?\s*([0-9][0-9,]*)""")
+HSTS_MIN_MAX_AGE = 31536000
+STRONG_REFERRER_POLICIES = {"no-referrer", "same-origin", "strict-origin-when-cross-origin"}
+HASH_PREFIXES = ("'sha256-", "'sha384-", "'sha512-")
+REFERRER_POLICIES = {"no-referrer", "no-referrer-when-downgrade", "same-origin", "origin", "strict-origin",
+                     "origin-when-cross-origin", "strict-origin-when-cross-origin", "unsafe-url"}
+
+
+class ContentSecurityPolicy:
+    __slots__ = ("directives",)
+
+    def __init__(self, directives):
+        self.directives = directives
+
+    def sources(self, directive):
+        return self.directives.get(directive, ())
+
+    def has(self, directive):
+        return directive in self.directives
+
+    def all_sources(self):
+        return {source for sources in self.directives.values() for source in sources}
+
+    def __repr__(self):
+        return f"ContentSecurityPolicy({self.directives})"
+
+
+class StrictTransportSecurity:
+    __slots__ = ("max_age", "include_subdomains", "preload")
+
+    def __init__(self, max_age, include_subdomains, preload):
+        self.max_age = max_age
+        self.include_subdomains = include_subdomains
+        self.preload = preload
+
+    def __repr__(self):
+        return (f"StrictTransportSecurity(max_age={self.max_age}, include_subdomains={self.include_subdomains}, "
+                f"preload={self.preload})")
+
+
+class Cookie:
+    __slots__ = ("name", "attributes")
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+
+    @property
+    def secure(self):
+        return "secure" in self.attributes
+
+    @property
+    def http_only(self):
+        return "httponly" in self.attributes
+
+    @property
+    def same_site(self):
+        return self.attributes.get("samesite")
+
+    def __repr__(self):
+        return f"Cookie(name={self.name}, attributes={self.attributes})"
+
+
+@lru_cache(maxsize=POLICY_CACHE_SIZE)
+def parse_csp(value):
+    # Several policies (comma or newline separated) are merged, the first occurrence of a directive wins.
+    directives = {}
+    for policy in POLICY_SEPARATOR.split(value.lower()):
+        for directive in policy.split(";"):
+            tokens = directive.split()
+            if tokens and tokens[0] not in directives:
+                directives[tokens[0]] = tuple(tokens[1:])
+    return ContentSecurityPolicy(directives)
+
+
+@lru_cache(maxsize=POLICY_CACHE_SIZE)
+def parse_hsts(value):
+    # Browsers honour the first header only; stray quotes and thousands separators in max-age are tolerated.
+    value = value.lower().split("\n", 1)[0]
+    match = MAX_AGE_PATTERN.search(value)
+    max_age = int(match.group(1).replace(",", "")) if match else None
+    directives = {directive.strip() for directive in value.split(";")}
+    return StrictTransportSecurity(max_age, "includesubdomains" in directives, "preload" in directives)
+
+
+@lru_cache(maxsize=POLICY_CACHE_SIZE)
+def parse_set_cookie(value):
+    cookies = []
+    for line in value.split("\n"):
+        parts = [part.strip() for part in line.split(";")]
+        if not parts[0]:
+            continue
+        attributes = {}
+        for attribute in parts[1:]:
+            name, _, attribute_value = attribute.partition("=")
+            if name:
+                attributes[name.strip().lower()] = attribute_value.strip().lower()
+        cookies.append(Cookie(parts[0].split("=", 1)[0].strip(), attributes))
+    return tuple(cookies)
+
+
+@lru_cache(maxsize=POLICY_CACHE_SIZE)
+def parse_referrer_policy(value):
+    # The last policy the browser recognises is the one applied.
+    policies = [token.strip() for token in POLICY_SEPARATOR.split(value.lower())]
+    return next((policy for policy in reversed(policies) if policy in REFERRER_POLICIES), None)
+
+
+def grade_csp(value):
+    policy = parse_csp(value)
+    sources = policy.all_sources()
+    strong = (
+            "'self'" in policy.sources("default-src")
+            and "'self'" in policy.sources("form-action")
+            and policy.sources("object-src") == ("'none'",)
+            and policy.has("upgrade-insecure-requests")
+            and policy.has("block-all-mixed-content")
+            and "'unsafe-eval'" not in sources
+            and ("'unsafe-inline'" not in sources
+                 or any(source.startswith(("'nonce-", *HASH_PREFIXES)) for source in sources))
+            and policy.sources("frame-ancestors") in (("'self'",), ("'none'",))
+            and not any(source.startswith("https://*") for source in sources)
+    )
+    return "Strong" if strong else "Weak"
+
+
+def grade_hsts(value):
+    policy = parse_hsts(value)
+    strong = policy.max_age is not None and policy.max_age >= HSTS_MIN_MAX_AGE and policy.include_subdomains
+    return "Strong" if strong else "Weak"
+
+
+def grade_set_cookie(value):
+    cookies = parse_set_cookie(value)
+    strong = bool(cookies) and all(cookie.secure and cookie.http_only and cookie.same_site in ("strict", "lax")
+                                   for cookie in cookies)
+    return "Strong" if strong else "Weak"
+
+
+def grade_referrer_policy(value):
+    return "Strong" if parse_referrer_policy(value) in STRONG_REFERRER_POLICIES else "Weak"
@@ -0,0 +1,87 @@
+import asyncio
+import socket
+import ssl
+
+from src.config import config
+from src.scanner.probe import get_address, get_ssl_context
+from src.scanner.retry import UnreachableError
+
+HTTP_PORT = 80
+HTTPS_PORT = 443
+OPEN = "open"
+TLS_ERROR = "tls_error"
+REFUSED = "refused"
+TIMED_OUT = "timeout"
+FAILED = "failed"
+NOT_RESOLVED = "dns"
+
+
+class Reachability:
+    def __init__(self, ports):
+        self.ports = ports
+
+    @property
+    def reachable(self):
+        return any(status in (OPEN, TLS_ERROR) for status in self.ports.values())
+
+    @property
+    def resolved(self):
+        return any(status != NOT_RESOLVED for status in self.ports.values())
+
+    def error(self, host):
+        # Stands in for the browser error the host would have caused, so it is classified the same way.
+        detail = f"connect pre-check of {host}: {self}"
+        if not self.resolved:
+            return socket.gaierror(f"net::ERR_NAME_NOT_RESOLVED ({detail})")
+        return UnreachableError(f"net::ERR_CONNECTION_FAILED ({detail})")
+
+    def __str__(self):
+        return ", ".join(f"{port}:{status}" for port, status in sorted(self.ports.items()))
+
+    def __repr__(self):
+        return f"Reachability({self})"
+
+
+def check_reachability(host, resolver=None, timeout=None):
+    return asyncio.run(check_host(host, resolver, timeout))
+
+
+async def check_host(host, resolver=None, timeout=None):
+    timeout = timeout or config.get('connect_timeout', 5)
+    try:
+        host = host.encode("idna").decode("ascii")
+    except UnicodeError:
+        return Reachability({HTTP_PORT: FAILED, HTTPS_PORT: FAILED})
+    address = get_address(host, resolver)
+    if address == host:
+        # Not pre-resolved: resolve once here so a lookup failure is reported as such, not as unreachable.
+        try:
+            addresses = await asyncio.wait_for(asyncio.get_running_loop().getaddrinfo(
+                host, None, type=socket.SOCK_STREAM), timeout)
+            address = addresses[0][4][0]
+        except (socket.gaierror, asyncio.TimeoutError, IndexError):
+            return Reachability({HTTP_PORT: NOT_RESOLVED, HTTPS_PORT: NOT_RESOLVED})
+    statuses = await asyncio.gather(check_port(address, host, HTTP_PORT, timeout),
+                                    check_port(address, host, HTTPS_PORT, timeout))
+    return Reachability(dict(zip((HTTP_PORT, HTTPS_PORT), statuses)))
+
+
+async def check_port(address, host, port, timeout):
+    secure = port == HTTPS_PORT
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(
+            address, port,
+            ssl=get_ssl_context(["h2", "http/1.1"]) if secure else None,
+            server_hostname=host if secure else None
+        ), timeout)
+    except asyncio.TimeoutError:
+        return TIMED_OUT
+    except ssl.SSLError:
+        # The TCP connection was accepted, the browser may still get through with its own TLS stack.
+        return TLS_ERROR
+    except ConnectionRefusedError:
+        return REFUSED
+    except OSError:
+        return FAILED
+    writer.close()
+    return OPEN
@@ -0,0 +1,254 @@
+import asyncio
+import re
+import ssl
+import zlib
+from urllib.parse import urlsplit, urljoin, quote
+
+from selenium.common.exceptions import TimeoutException
+
+from src.config import config
+from src.scanner.scan_result import ScanResult
+
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+CHALLENGE_STATUSES = {401, 403, 429, 503}
+MAX_REDIRECTS = 20
+MAX_HEADER_LINES = 200
+BODY_SNIFF_BYTES = 64 * 1024
+ACCEPT = "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"
+JS_REDIRECT_MAX_BYTES = 8 * 1024
+META_REFRESH_PATTERN = re.compile(rb"http-equiv\s*=\s*[\"']?refresh", re.IGNORECASE)
+JS_REDIRECT_PATTERN = re.compile(
+    rb"(?:window|document|top|self)\.location(?:\.href)?\s*="
+    rb"|location\.(?:replace|assign)\s*\("
+    rb"|location\.href\s*=",
+    re.IGNORECASE
+)
+BOT_CHALLENGE_PATTERN = re.compile(
+    rb"challenge-platform|cf-browser-verification|_incapsula_resource|checking your browser",
+    re.IGNORECASE
+)
+
+
+class ProbeEscalation(Exception):
+    pass
+
+
+class ProbeResponse:
+    def __init__(self, url, status, headers, version, body=b""):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.version = version
+        self.body = body
+
+    def header(self, name, default=""):
+        name = name.lower()
+        return next((v for k, v in self.headers.items() if k.lower() == name), default)
+
+
+def get_ssl_context(alpn_protocols):
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    context.set_alpn_protocols(alpn_protocols)
+    return context
+
+
+def probe_url(url, user_agent, language, resolver=None, timeout=None):
+    return asyncio.run(probe(url, user_agent, language, resolver, timeout))
+
+
+async def probe(url, user_agent, language, resolver=None, timeout=None):
+    timeout = timeout or config.get('probe_timeout', 15)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    try:
+        # One budget for the whole redirect chain, not one per hop.
+        result = await asyncio.wait_for(follow_redirects(url, user_agent, language, resolver), timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutException(f"Probe of {url} timed out after {timeout:g}s") from None
+
+    remaining = deadline - loop.time()
+    if urlsplit(result.final_url).scheme == "https" and result.protocol == "http/1.1" and remaining > 0:
+        try:
+            result.protocol = await asyncio.wait_for(negotiate_protocol(result.final_url, resolver), remaining)
+        except (OSError, asyncio.TimeoutError):
+            pass
+    return result
+
+
+async def follow_redirects(url, user_agent, language, resolver):
+    initial_status = None
+    redirect_count = 0
+    current_url = url
+
+    for _ in range(MAX_REDIRECTS + 1):
+        response = await fetch(current_url, user_agent, language, resolver)
+        if initial_status is None:
+            initial_status = response.status
+
+        location = response.header("location")
+        if response.status in REDIRECT_STATUSES and location:
+            redirect_count += 1
+            current_url = urljoin(current_url, location.strip())
+            if urlsplit(current_url).scheme not in ("http", "https"):
+                raise ProbeEscalation(f"Redirect to unsupported scheme: {current_url}")
+            continue
+
+        check_escalation(response)
+        return ScanResult(
+            initial_status=initial_status,
+            final_status=response.status,
+            redirect_count=redirect_count,
+            headers=response.headers,
+            protocol=response.version,
+            final_url=current_url
+        )
+
+    raise ConnectionError(f"net::ERR_TOO_MANY_REDIRECTS at {url}")
+
+
+def check_escalation(response):
+    if response.status is None:
+        raise ProbeEscalation(f"Empty response from {response.url}")
+    if response.status in CHALLENGE_STATUSES:
+        raise ProbeEscalation(f"Possible bot challenge ({response.status}) at {response.url}")
+    if response.header("cf-mitigated") or BOT_CHALLENGE_PATTERN.search(response.body):
+        raise ProbeEscalation(f"Bot challenge detected at {response.url}")
+    if "html" in response.header("content-type").lower() and 200 <= response.status < 300:
+        if not response.body:
+            raise ProbeEscalation(f"Empty document from {response.url}")
+        if META_REFRESH_PATTERN.search(response.body) or (
+                len(response.body) <= JS_REDIRECT_MAX_BYTES and JS_REDIRECT_PATTERN.search(response.body)):
+            raise ProbeEscalation(f"Client-side redirect at {response.url}")
+
+
+def get_address(host, resolver):
+    return (resolver.address(host) if resolver else None) or host
+
+
+async def fetch(url, user_agent, language, resolver=None):
+    parts = urlsplit(url)
+    secure = parts.scheme == "https"
+    host = parts.hostname.encode("idna").decode("ascii")
+    port = parts.port or (443 if secure else 80)
+    path = quote(parts.path or "/", safe="/%:@!$&'()*+,;=-._~")
+    if parts.query:
+        path += "?" + quote(parts.query, safe="=&%+/:@!$'()*,;-._~")
+    host_header = host if parts.port is None else f"{host}:{port}"
+
+    reader, writer = await asyncio.open_connection(
+        get_address(host, resolver), port,
+        ssl=get_ssl_context(["http/1.1"]) if secure else None,
+        server_hostname=host if secure else None
+    )
+    try:
+        request = (
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {host_header}\r\n"
+            f"User-Agent: {user_agent}\r\n"
+            f"Accept: {ACCEPT}\r\n"
+            f"Accept-Language: {language}\r\n"
+            f"Accept-Encoding: identity\r\n"
+            f"Connection: close\r\n\r\n"
+        )
+        writer.write(request.encode("latin-1", errors="replace"))
+        await writer.drain()
+
+        status_line = (await reader.readline()).decode("latin-1").strip()
+        if not status_line:
+            return ProbeResponse(url, None, {}, "http/1.1")
+        version, status = parse_status_line(status_line)
+        headers = await read_headers(reader)
+        response = ProbeResponse(url, status, headers, version)
+        if status not in REDIRECT_STATUSES and "html" in response.header("content-type").lower():
+            response.body = await read_body(reader, response)
+        return response
+    finally:
+        writer.close()
+
+
+def parse_status_line(status_line):
+    parts = status_line.split(" ", 2)
+    if len(parts) < 2 or not parts[0].startswith("HTTP/") or not parts[1].isdigit():
+        raise ProbeEscalation(f"Malformed status line: {status_line[:80]}")
+    return parts[0].lower(), int(parts[1])
+
+
+async def read_headers(reader):
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = (await reader.readline()).decode("latin-1").rstrip("\r\n")
+        if not line:
+            break
+        if ":" not in line:
+            continue
+        name, value = line.split(":", 1)
+        name = name.strip()
+        value = value.strip()
+        # Chrome reports repeated headers as a single newline-joined value.
+        existing = next((k for k in headers if k.lower() == name.lower()), None)
+        if existing is not None:
+            headers[existing] = f"{headers[existing]}\n{value}"
+        else:
+            headers[name] = value
+    return headers
+
+
+async def read_body(reader, response):
+    limit = BODY_SNIFF_BYTES
+    content_length = response.header("content-length")
+    if content_length.isdigit():
+        limit = min(limit, int(content_length))
+    body = b""
+    try:
+        while len(body) < limit:
+            data = await reader.read(limit - len(body))
+            if not data:
+                break
+            body += data
+    except ConnectionError:
+        pass
+    if "chunked" in response.header("transfer-encoding").lower():
+        body = dechunk(body)
+    encoding = response.header("content-encoding").lower()
+    if not encoding or encoding == "identity":
+        return body
+    wbits = 16 + zlib.MAX_WBITS if encoding == "gzip" else zlib.MAX_WBITS
+    try:
+        return zlib.decompressobj(wbits).decompress(body, BODY_SNIFF_BYTES)
+    except zlib.error:
+        raise ProbeEscalation(f"Unsupported {encoding} body at {response.url}")
+
+
+def dechunk(body):
+    data = bytearray()
+    position = 0
+    while position < len(body):
+        line_end = body.find(b"\r\n", position)
+        if line_end == -1:
+            break
+        try:
+            size = int(body[position:line_end].split(b";")[0], 16)
+        except ValueError:
+            break
+        if size == 0:
+            break
+        start = line_end + 2
+        data += body[start:start + size]
+        position = start + size + 2
+    return bytes(data)
+
+
+async def negotiate_protocol(url, resolver=None):
+    parts = urlsplit(url)
+    host = parts.hostname.encode("idna").decode("ascii")
+    _, writer = await asyncio.open_connection(
+        get_address(host, resolver), parts.port or 443,
+        ssl=get_ssl_context(["h2", "http/1.1"]),
+        server_hostname=host
+    )
+    try:
+        return writer.get_extra_info("ssl_object").selected_alpn_protocol() or "http/1.1"
+    finally:
+        writer.close()
@@ -0,0 +1,73 @@
+import threading
+import time
+
+from src.config import config
+
+SECOND_LEVEL_LABELS = {"ac", "co", "com", "edu", "gov", "gv", "net", "org", "or", "ne", "go", "sch", "uni"}
+
+
+class Deferral:
+    def __init__(self, platforms, delay, reason):
+        self.platforms = platforms
+        self.delay = delay
+        self.reason = reason
+
+    def __repr__(self):
+        return f"Deferral(delay={self.delay:.2f}s, reason={self.reason})"
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost):
+        if self.tokens >= cost:
+            return 0
+        return (min(cost, self.burst) - self.tokens) / self.rate
+
+
+class RateLimiter:
+    def __init__(self, limits=None):
+        self.limits = limits if limits is not None else config.get('rate_limits', {})
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, keys, cost=1):
+        keys = [(kind, value) for kind, value in keys if value and kind in self.limits]
+        now = time.monotonic()
+        with self._lock:
+            buckets = [self._get_bucket(key, now) for key in keys]
+            wait_time = max((bucket.wait_time(cost) for bucket in buckets), default=0)
+            if wait_time > 0:
+                return wait_time
+            for bucket in buckets:
+                bucket.tokens -= min(cost, bucket.burst)
+            return 0
+
+    def _get_bucket(self, key, now):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            limit = self.limits[key[0]]
+            bucket = self._buckets[key] = TokenBucket(limit["rate"], limit["burst"])
+        bucket.refill(now)
+        return bucket
+
+
+def registrable_domain(host):
+    labels = host.lower().strip(".").split(".")
+    if len(labels) <= 2:
+        return ".".join(labels)
+    if len(labels[-1]) == 2 and labels[-2] in SECOND_LEVEL_LABELS:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+def get_rate_limit_keys(host, resolver):
+    return [("domain", registrable_domain(host)), ("ip", resolver.address(host))]
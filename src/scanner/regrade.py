@@ -0,0 +1,110 @@
+import argparse
+import logging
+import os
+import time
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src.config import config
+from src.scanner.grader import grader, load_headers
+from src.scanner.result_db import DATABASE_PATH, ResultDatabase, read_chunks
+from src.scanner.result_store import CSV_STORE, PARQUET_STORE, RESULT_DIRECTORY, RESULT_FILE_PATTERN, \
+    SQLITE_STORE, STORE_DIRNAME, conform, find_files
+
+GRADE_SUFFIXES = ("_presence", "_config")
+
+
+def regrade_frame(frame):
+    # Rows without parsable raw headers keep the grades they were scanned with.
+    if "raw_headers" not in frame.columns:
+        return frame, 0
+    headers = frame["raw_headers"].map(load_headers)
+    parsed = headers.notna()
+    if not parsed.any():
+        return frame, 0
+
+    records = [{name.lower(): value for name, value in received.items()} for received in headers[parsed]]
+    grades = grader.grade_frame(pd.DataFrame.from_records(records, index=headers.index[parsed]))
+
+    # Headers removed from the expected list no longer get columns.
+    stale = [column for column in frame.columns if column.endswith(GRADE_SUFFIXES) and column not in grades.columns]
+    frame = frame.drop(columns=stale)
+    for column in grades.columns:
+        previous = frame[column] if column in frame.columns else pd.Series(None, index=frame.index, dtype="object")
+        frame[column] = grades[column].reindex(frame.index).astype("object").where(parsed, previous)
+    return frame, int(parsed.sum())
+
+
+def regrade_parquet(directory):
+    total = 0
+    for file in find_files(directory):
+        frame, regraded = regrade_frame(pq.ParquetFile(file).read().to_pandas())
+        if not regraded:
+            continue
+        temporary = os.path.join(os.path.dirname(file), f".{os.path.basename(file)}")
+        pq.write_table(conform(frame), temporary)
+        os.replace(temporary, file)
+        total += regraded
+    return total
+
+
+def regrade_csv(directory):
+    total = 0
+    for filename in sorted(os.listdir(directory)):
+        if not RESULT_FILE_PATTERN.match(filename) or filename.endswith("_errors.csv"):
+            continue
+        file = os.path.join(directory, filename)
+        temporary = os.path.join(directory, f".{filename}")
+        with open(temporary, mode='w', newline='', encoding='utf-8') as output:
+            for index, chunk in enumerate(pd.read_csv(file, dtype=str, chunksize=config.get('csv_chunk_size', 1000))):
+                chunk, regraded = regrade_frame(chunk)
+                chunk.to_csv(output, header=index == 0, index=False)
+                total += regraded
+            output.flush()
+            os.fsync(output.fileno())
+        os.replace(temporary, file)
+        logging.info(f"Regraded {filename}")
+    return total
+
+
+def regrade_sqlite(path):
+    # Grade columns of headers that are no longer expected stay in the table but are not rewritten.
+    database = ResultDatabase(path)
+    total = 0
+    try:
+        for chunk in read_chunks(path):
+            chunk, regraded = regrade_frame(chunk)
+            if regraded:
+                database.upsert(chunk)
+                total += regraded
+    finally:
+        database.close()
+    return total
+
+
+def regrade(store=None, directory=RESULT_DIRECTORY):
+    store = store or config.get('result_store', CSV_STORE)
+    start = time.monotonic()
+    if store == SQLITE_STORE:
+        total = regrade_sqlite(os.path.join(directory, os.path.basename(DATABASE_PATH)))
+    elif store == PARQUET_STORE:
+        total = regrade_parquet(os.path.join(directory, STORE_DIRNAME))
+    else:
+        total = regrade_csv(directory)
+    logging.info(f"Regraded {total} results in {time.monotonic() - start:.1f}s.")
+    return total
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Recompute header grades from stored raw headers.")
+    parser.add_argument("--store", choices=[CSV_STORE, PARQUET_STORE, SQLITE_STORE],
+                        default=config.get('result_store', CSV_STORE))
+    parser.add_argument("--directory", default=RESULT_DIRECTORY, help="results directory")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    arguments = parse_arguments()
+    regrade(arguments.store, arguments.directory)
@@ -0,0 +1,179 @@
+import asyncio
+import ipaddress
+import logging
+import random
+import socket
+import struct
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from src.config import config
+
+DNS_PORT = 53
+TYPE_A = 1
+CLASS_IN = 1
+RCODE_NOERROR = 0
+RCODE_NXDOMAIN = 3
+RESOLVED = "resolved"
+NXDOMAIN = "nxdomain"
+UNKNOWN = "unknown"
+
+
+class Resolution:
+    def __init__(self, status, addresses=None, ttl=0):
+        self.status = status
+        self.addresses = addresses or []
+        self.expires_at = time.monotonic() + ttl
+
+    @property
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def __repr__(self):
+        return f"Resolution(status={self.status}, addresses={self.addresses})"
+
+
+class DnsQueryProtocol(asyncio.DatagramProtocol):
+    def __init__(self, query_id):
+        self.query_id = query_id
+        self.response = asyncio.get_running_loop().create_future()
+
+    def datagram_received(self, data, addr):
+        if len(data) >= 2 and struct.unpack("!H", data[:2])[0] == self.query_id and not self.response.done():
+            self.response.set_result(data)
+
+    def error_received(self, exc):
+        if not self.response.done():
+            self.response.set_exception(exc)
+
+
+class Resolver:
+    def __init__(self, server=None, concurrency=None, max_ttl=None, negative_ttl=None, timeout=None, size=None):
+        self.server = server or config.get('dns_server', '1.1.1.1')
+        self.concurrency = concurrency or config.get('dns_concurrency', 64)
+        self.max_ttl = max_ttl or config.get('dns_cache_ttl', 3600)
+        self.negative_ttl = negative_ttl or config.get('dns_negative_ttl', 900)
+        self.timeout = timeout or config.get('dns_timeout', 5)
+        self.size = size or config.get('dns_cache_size', 10000)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dns-prefetch")
+
+    def lookup(self, host):
+        with self._lock:
+            resolution = self._cache.get(host)
+            if resolution is None:
+                return None
+            if resolution.expired:
+                del self._cache[host]
+                return None
+            self._cache.move_to_end(host)
+        return resolution
+
+    def address(self, host):
+        resolution = self.lookup(host)
+        if resolution is None or not resolution.addresses:
+            return None
+        return resolution.addresses[0]
+
+    def add(self, host, addresses, ttl=None):
+        self._remember(host, Resolution(RESOLVED, addresses, ttl or self.max_ttl))
+
+    def is_nxdomain(self, host):
+        resolution = self.lookup(host)
+        return resolution is not None and resolution.status == NXDOMAIN
+
+    def prefetch(self, hosts):
+        # Resolved in the background, one batch at a time, while the rows before them are scanned.
+        return self._executor.submit(self._prefetch, hosts)
+
+    def _prefetch(self, hosts):
+        try:
+            asyncio.run(self.resolve_all(hosts))
+        except Exception as e:
+            logging.error(f"Error pre-resolving domains: {e}")
+
+    async def resolve_all(self, hosts):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def resolve_host(host):
+            async with semaphore:
+                await self.resolve(host)
+
+        pending = [host for host in hosts if host and self.lookup(host) is None]
+        await asyncio.gather(*(resolve_host(host) for host in pending))
+        logging.info(f"Pre-resolved {len(pending)} domains.")
+
+    async def resolve(self, host):
+        try:
+            ipaddress.ip_address(host)
+            resolution = Resolution(RESOLVED, [host], self.max_ttl)
+        except ValueError:
+            try:
+                resolution = await asyncio.wait_for(self.query(host), self.timeout)
+            except (OSError, UnicodeError, ValueError, asyncio.TimeoutError) as e:
+                logging.debug(f"DNS lookup failed for {host}: {e}")
+                resolution = Resolution(UNKNOWN, ttl=self.negative_ttl)
+        self._remember(host, resolution)
+        return resolution
+
+    def _remember(self, host, resolution):
+        with self._lock:
+            self._cache[host] = resolution
+            self._cache.move_to_end(host)
+            while len(self._cache) > self.size:
+                self._cache.popitem(last=False)
+
+    async def query(self, host):
+        query_id = random.randint(0, 0xFFFF)
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.create_datagram_endpoint(
+            lambda: DnsQueryProtocol(query_id), remote_addr=(self.server, DNS_PORT))
+        try:
+            transport.sendto(build_query(query_id, host))
+            return self.parse_response(await protocol.response)
+        finally:
+            transport.close()
+
+    def parse_response(self, data):
+        flags, question_count, answer_count = struct.unpack("!HHH", data[2:8])
+        rcode = flags & 0x000F
+        if rcode == RCODE_NXDOMAIN:
+            return Resolution(NXDOMAIN, ttl=self.negative_ttl)
+        if rcode != RCODE_NOERROR:
+            return Resolution(UNKNOWN, ttl=self.negative_ttl)
+
+        offset = 12
+        for _ in range(question_count):
+            offset = skip_name(data, offset) + 4
+        addresses = []
+        ttl = self.max_ttl
+        for _ in range(answer_count):
+            offset = skip_name(data, offset)
+            record_type, record_class, record_ttl, length = struct.unpack("!HHIH", data[offset:offset + 10])
+            offset += 10
+            if record_type == TYPE_A and record_class == CLASS_IN and length == 4:
+                addresses.append(socket.inet_ntoa(data[offset:offset + 4]))
+                ttl = min(ttl, record_ttl)
+            offset += length
+        if not addresses:
+            return Resolution(UNKNOWN, ttl=self.negative_ttl)
+        return Resolution(RESOLVED, addresses, ttl)
+
+
+def build_query(query_id, host):
+    header = struct.pack("!HHHHHH", query_id, 0x0100, 1, 0, 0, 0)
+    name = b"".join(bytes([len(label)]) + label for label in host.encode("idna").split(b".") if label)
+    return header + name + b"\x00" + struct.pack("!HH", TYPE_A, CLASS_IN)
+
+
+def skip_name(data, offset):
+    while True:
+        length = data[offset]
+        if length == 0:
+            return offset + 1
+        if length & 0xC0 == 0xC0:
+            return offset + 2
+        offset += length + 1
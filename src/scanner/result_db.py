@@ -0,0 +1,238 @@
+import datetime
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src.config import config
+from src.scanner.result_store import RESULT_DIRECTORY, get_scan_schema
+
+DATABASE_PATH = os.path.join(RESULT_DIRECTORY, 'results.sqlite')
+KEY_COLUMNS = ["ETER_ID", "platform", "run_id"]
+RANK_COLUMN = "result_rank"
+ROWID_COLUMN = "result_rowid"
+
+
+def quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def get_sql_type(data_type):
+    if pa.types.is_integer(data_type) or pa.types.is_boolean(data_type):
+        return "INTEGER"
+    return "TEXT"
+
+
+def to_sql_value(value):
+    if value is None or value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if isinstance(value, (bool, np.bool_)):
+        return int(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, (int, float, str)):
+        return value
+    return str(value)
+
+
+class ResultDatabase:
+    def __init__(self, path=DATABASE_PATH, run_id=None):
+        self.path = path
+        self.run_id = run_id or pd.Timestamp.now().strftime("%Y%m%dT%H%M%S")
+        self.batch_size = config.get('result_batch_size', 20)
+        self.schema = get_scan_schema()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._columns = None
+
+    def write(self, results, country_code, platform):
+        frame = results if isinstance(results, pd.DataFrame) else pd.DataFrame(results)
+        if frame.empty:
+            return
+        frame = frame.assign(country=country_code, platform=platform, run_id=self.run_id)
+        self.upsert(frame)
+
+    def upsert(self, frame):
+        # Blocks until the batch is committed, so callers may journal the rows afterwards.
+        future = Future()
+        with self._lock:
+            # Queued under the lock, so a writer that failed to start either fails this batch or is replaced.
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="result-writer", daemon=True)
+                self._thread.start()
+            self._queue.put((frame, future))
+        return future.result(timeout=config.get('result_write_timeout', 300))
+
+    def close(self):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _run(self):
+        try:
+            connection = self._connect()
+        except Exception as e:
+            logging.error(f"Error opening the results database {self.path}: {e}")
+            self._fail_pending(e)
+            return
+        try:
+            self._write_batches(connection)
+        except Exception as e:
+            logging.error(f"Result writer for {self.path} stopped: {e}")
+            self._fail_pending(e)
+        finally:
+            connection.close()
+
+    def _fail_pending(self, error):
+        with self._lock:
+            self._thread = None
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    item[1].set_exception(error)
+
+    def _write_batches(self, connection):
+        stopping = False
+        while not stopping:
+            batch = []
+            item = self._queue.get()
+            # Everything queued meanwhile is written in the same transaction.
+            while item is not None:
+                batch.append(item)
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            stopping = item is None
+            if not batch:
+                continue
+            try:
+                with connection:
+                    counts = [self._upsert(connection, frame) for frame, _ in batch]
+            except Exception as e:
+                logging.error(f"Error writing {len(batch)} result batches to {self.path}: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future), count in zip(batch, counts):
+                    future.set_result(count)
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        with connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS results ("ETER_ID" TEXT NOT NULL, platform TEXT NOT NULL, '
+                               'run_id TEXT NOT NULL, country TEXT, "NUTS2" TEXT)')
+            connection.execute('CREATE UNIQUE INDEX IF NOT EXISTS results_key ON results ("ETER_ID", platform, run_id)')
+            connection.execute('CREATE INDEX IF NOT EXISTS results_country ON results (country)')
+            connection.execute('CREATE INDEX IF NOT EXISTS results_nuts2 ON results ("NUTS2")')
+            connection.execute(f'CREATE VIEW IF NOT EXISTS latest_results AS SELECT * FROM ('
+                               f'SELECT *, ROW_NUMBER() OVER (PARTITION BY "ETER_ID", platform '
+                               f'ORDER BY run_id DESC) AS {RANK_COLUMN} FROM results) WHERE {RANK_COLUMN} = 1')
+        self._columns = {row[1] for row in connection.execute("PRAGMA table_info(results)")}
+        return connection
+
+    def _add_columns(self, connection, columns):
+        types = {field.name: get_sql_type(field.type) for field in self.schema}
+        for column in columns:
+            if column not in self._columns:
+                connection.execute(f"ALTER TABLE results ADD COLUMN {quote(column)} {types.get(column, 'TEXT')}")
+                self._columns.add(column)
+
+    def _upsert(self, connection, frame):
+        if "ETER_ID" not in frame.columns or frame["ETER_ID"].isna().any():
+            url_column = next((column for column in frame.columns if column.lower() == 'url'), None)
+            keys = frame["ETER_ID"] if "ETER_ID" in frame.columns else pd.Series(None, index=frame.index)
+            frame = frame.assign(ETER_ID=keys.fillna(frame[url_column]) if url_column else keys)
+        columns = [column for column in frame.columns if column != RANK_COLUMN]
+        self._add_columns(connection, columns)
+        updates = ", ".join(f"{quote(column)} = excluded.{quote(column)}"
+                            for column in columns if column not in KEY_COLUMNS)
+        statement = (f"INSERT INTO results ({', '.join(quote(column) for column in columns)}) "
+                     f"VALUES ({', '.join('?' for _ in columns)}) "
+                     f"ON CONFLICT ({', '.join(quote(column) for column in KEY_COLUMNS)}) DO "
+                     f"{f'UPDATE SET {updates}' if updates else 'NOTHING'}")
+        rows = [tuple(to_sql_value(value) for value in row)
+                for row in frame[columns].itertuples(index=False, name=None)]
+        connection.executemany(statement, rows)
+        return len(rows)
+
+
+def read_results(path=DATABASE_PATH, countries=None, platforms=None, nuts2=None, since=None, columns=None,
+                 latest=True):
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    conditions, parameters = [], []
+    for column, values in (("country", countries), ("platform", platforms), ("NUTS2", nuts2)):
+        if values is not None:
+            values = list(values)
+            conditions.append(f"{quote(column)} IN ({', '.join('?' for _ in values)})")
+            parameters.extend(values)
+    if since is not None:
+        conditions.append("assessment_datetime >= ?")
+        parameters.append(str(since))
+    if columns is not None:
+        columns = list(dict.fromkeys([*columns, "country", "platform"]))
+    selection = ", ".join(quote(column) for column in columns) if columns is not None else "*"
+    source = "latest_results" if latest else "results"
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    connection = sqlite3.connect(path)
+    try:
+        frame = pd.read_sql_query(f"SELECT {selection} FROM {source}{where}", connection, params=parameters)
+    finally:
+        connection.close()
+    return restore_types(frame.drop(columns=[RANK_COLUMN], errors="ignore"))
+
+
+def read_chunks(path=DATABASE_PATH, chunk_size=None):
+    # Walks the whole results table by rowid, so only one chunk is in memory and upserts in between are safe.
+    if not os.path.exists(path):
+        return
+    chunk_size = chunk_size or config.get('csv_chunk_size', 1000)
+    connection = sqlite3.connect(path)
+    try:
+        last_rowid = 0
+        while True:
+            frame = pd.read_sql_query(f"SELECT rowid AS {ROWID_COLUMN}, * FROM results WHERE rowid > ? "
+                                      f"ORDER BY rowid LIMIT ?", connection, params=[last_rowid, chunk_size])
+            if frame.empty:
+                return
+            last_rowid = int(frame[ROWID_COLUMN].iloc[-1])
+            yield restore_types(frame.drop(columns=[ROWID_COLUMN]))
+    finally:
+        connection.close()
+
+
+def restore_types(frame):
+    for field in get_scan_schema():
+        if field.name not in frame.columns:
+            continue
+        if pa.types.is_boolean(field.type):
+            frame[field.name] = frame[field.name].map({1: True, 0: False}).astype("object")
+        elif pa.types.is_timestamp(field.type):
+            frame[field.name] = pd.to_datetime(frame[field.name], errors="coerce", format="ISO8601")
+    return frame
+
+
+result_database = ResultDatabase()
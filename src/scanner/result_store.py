@@ -0,0 +1,158 @@
+import logging
+import os
+import re
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.config import config, EXPECTED_HEADERS_KEY
+from src.scanner.utils.utils import save
+
+RESULT_DIRECTORY = os.path.join('.', 'src', 'data', 'results')
+STORE_DIRNAME = 'store'
+CSV_STORE = "csv"
+PARQUET_STORE = "parquet"
+SQLITE_STORE = "sqlite"
+PARTITION_FIELDS = [("country", pa.string()), ("platform", pa.string()), ("run_date", pa.string())]
+PARTITIONING = ds.partitioning(pa.schema(PARTITION_FIELDS), flavor="hive")
+RESULT_FILE_PATTERN = re.compile(r'^([a-zA-Z]{2})_(.+)\.csv$')
+BOOLEAN_VALUES = {"true": True, "false": False, "1": True, "0": False}
+
+
+def get_scan_schema():
+    fields = [
+        ("assessment_datetime", pa.timestamp("us")),
+        ("http_status_code", pa.int32()),
+        ("https_status_code", pa.int32()),
+        ("redirected_to_https", pa.bool_()),
+        ("redirected_https_to_same_domain", pa.bool_()),
+        ("final_url", pa.string()),
+        ("idioma", pa.string()),
+        ("protocol_http", pa.string()),
+        ("redirect_count", pa.int32()),
+    ]
+    for header in config[EXPECTED_HEADERS_KEY]:
+        fields.append((f"{header.lower()}_presence", pa.bool_()))
+        fields.append((f"{header.lower()}_config", pa.string()))
+    fields.append(("raw_headers", pa.string()))
+    return pa.schema(fields)
+
+
+def conform(frame, schema=None):
+    # Scan columns get their fixed types, source columns are kept as nullable strings.
+    schema = schema or get_scan_schema()
+    partition_columns = [name for name, _ in PARTITION_FIELDS]
+    source_columns = [column for column in frame.columns
+                      if column not in schema.names and column not in partition_columns]
+    arrays = []
+    fields = []
+    for column in source_columns:
+        arrays.append(pa.array(frame[column].astype("string"), type=pa.string(), from_pandas=True))
+        fields.append(pa.field(column, pa.string()))
+    for field in schema:
+        values = frame[field.name] if field.name in frame.columns else pd.Series(None, index=frame.index,
+                                                                                  dtype="object")
+        arrays.append(pa.array(coerce(values, field.type), type=field.type, from_pandas=True))
+        fields.append(field)
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def coerce(values, data_type):
+    if pa.types.is_timestamp(data_type):
+        return pd.to_datetime(values, errors="coerce")
+    if pa.types.is_integer(data_type):
+        return pd.to_numeric(values, errors="coerce").astype("Int32")
+    if pa.types.is_boolean(data_type):
+        return values.map(lambda value: value if isinstance(value, bool) or value is None
+                          else BOOLEAN_VALUES.get(str(value).strip().lower())).astype("boolean")
+    return values.astype("string")
+
+
+class CsvResultStore:
+    def __init__(self):
+        self.batch_size = config.get('result_batch_size', 20)
+
+    def write(self, results, country_code, platform):
+        save(results, country_code, platform)
+
+
+class ParquetResultStore:
+    def __init__(self, directory=None, run_date=None):
+        self.directory = directory or os.path.join(RESULT_DIRECTORY, STORE_DIRNAME)
+        self.run_date = run_date or pd.Timestamp.now().strftime("%Y-%m-%d")
+        self.batch_size = config.get('parquet_batch_size', 500)
+        self.schema = get_scan_schema()
+
+    def write(self, results, country_code, platform, run_date=None):
+        frame = results if isinstance(results, pd.DataFrame) else pd.DataFrame(results)
+        if frame.empty:
+            return
+        partition = os.path.join(self.directory, f"country={country_code}", f"platform={platform}",
+                                 f"run_date={run_date or self.run_date}")
+        os.makedirs(partition, exist_ok=True)
+        filename = f"part-{uuid.uuid4().hex}.parquet"
+        # Hidden until complete, dataset discovery skips names starting with a dot.
+        temporary = os.path.join(partition, f".{filename}")
+        pq.write_table(conform(frame, self.schema), temporary)
+        os.replace(temporary, os.path.join(partition, filename))
+
+
+def find_files(directory, countries=None, platforms=None, since=None):
+    files = []
+    for root, _, filenames in os.walk(directory):
+        partition = dict(part.split("=", 1) for part in os.path.relpath(root, directory).split(os.sep) if "=" in part)
+        if countries is not None and partition.get("country") not in countries:
+            continue
+        if platforms is not None and partition.get("platform") not in platforms:
+            continue
+        if since is not None and partition.get("run_date", "") < str(since):
+            continue
+        files.extend(os.path.join(root, filename) for filename in filenames
+                     if filename.endswith(".parquet") and not filename.startswith((".", "_")))
+    return files
+
+
+def read_results(directory=None, countries=None, platforms=None, since=None, columns=None, filter=None):
+    directory = directory or os.path.join(RESULT_DIRECTORY, STORE_DIRNAME)
+    # Partitions are pruned from the directory names before any file footer is read.
+    files = find_files(directory, countries, platforms, since)
+    if not files:
+        return pd.DataFrame()
+    schema = pa.unify_schemas([pq.read_schema(file) for file in files] + [pa.schema(PARTITION_FIELDS)])
+    dataset = ds.dataset(files, schema=schema, format="parquet", partitioning=PARTITIONING,
+                         partition_base_dir=directory)
+    if columns is not None:
+        columns = list(dict.fromkeys([*columns, "country", "platform"]))
+    return dataset.to_table(columns=columns, filter=filter).to_pandas()
+
+
+def import_csv_results(directory=RESULT_DIRECTORY, store=None):
+    store = store or ParquetResultStore(os.path.join(directory, STORE_DIRNAME))
+    imported = 0
+    for filename in sorted(os.listdir(directory)):
+        match = RESULT_FILE_PATTERN.match(filename)
+        if not match or filename.endswith("_errors.csv"):
+            continue
+        country_code, platform = match.groups()
+        frame = pd.read_csv(os.path.join(directory, filename), dtype=str)
+        if frame.empty:
+            continue
+        scanned_at = pd.to_datetime(frame.get("assessment_datetime"), errors="coerce")
+        unparsable = int(scanned_at.isna().sum()) if scanned_at is not None else len(frame)
+        if unparsable:
+            logging.warning(f"{unparsable} rows of {filename} have no valid assessment_datetime, "
+                            f"their typed columns may be misaligned.")
+        run_dates = scanned_at.dt.strftime("%Y-%m-%d").fillna("unknown") if scanned_at is not None else "unknown"
+        for run_date, rows in frame.groupby(run_dates):
+            store.write(rows.drop(columns=["platform"], errors="ignore"), country_code.lower(), platform, run_date)
+        imported += len(frame)
+        logging.info(f"Imported {len(frame)} rows from {filename}")
+    return imported
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.info(f"Imported {import_csv_results()} result rows into the Parquet store.")
@@ -0,0 +1,120 @@
+import asyncio
+import heapq
+import itertools
+import random
+import socket
+import ssl
+import time
+
+from selenium.common.exceptions import InvalidSessionIdException, TimeoutException
+
+from src.config import config
+
+DNS = "dns"
+TIMEOUT = "timeout"
+CONNECTION = "connection"
+TLS = "tls"
+BOT_BLOCK = "bot_block"
+DRIVER_CRASH = "driver_crash"
+UNREACHABLE = "unreachable"
+OTHER = "other"
+
+ERROR_PATTERNS = [
+    (DNS, ["err_name_not_resolved", "err_name_resolution_failed", "name or service not known",
+           "nodename nor servname", "no address associated"]),
+    (TIMEOUT, ["err_connection_timed_out", "err_timed_out", "timed out", "timeout"]),
+    (TLS, ["err_ssl_", "err_cert_", "err_bad_ssl_client_auth", "certificate verify", "sslv3", "tlsv1"]),
+    (CONNECTION, ["err_connection_refused", "err_connection_reset", "err_connection_closed",
+                  "err_address_unreachable", "err_empty_response", "connect call failed"]),
+    (DRIVER_CRASH, ["invalid session id", "session deleted", "chrome not reachable", "tab crashed",
+                    "disconnected", "pool is shut down", "no such window"]),
+]
+
+
+class BotBlockError(Exception):
+    pass
+
+
+class UnreachableError(ConnectionError):
+    pass
+
+
+def classify(exception):
+    if isinstance(exception, BotBlockError):
+        return BOT_BLOCK
+    if isinstance(exception, UnreachableError):
+        return UNREACHABLE
+    if isinstance(exception, socket.gaierror):
+        return DNS
+    if isinstance(exception, ssl.SSLError):
+        return TLS
+    if isinstance(exception, (TimeoutException, asyncio.TimeoutError, TimeoutError)):
+        return TIMEOUT
+    if isinstance(exception, InvalidSessionIdException):
+        return DRIVER_CRASH
+
+    message = str(exception).lower()
+    for error_class, patterns in ERROR_PATTERNS:
+        if any(pattern in message for pattern in patterns):
+            return error_class
+    if isinstance(exception, ConnectionError):
+        return CONNECTION
+    return OTHER
+
+
+def get_retry_policy(error_class):
+    return config.get('retry_policy', {}).get(error_class, {"max_retries": 0})
+
+
+def should_retry(error_class, attempt):
+    return attempt < get_retry_policy(error_class).get("max_retries", 0)
+
+
+def get_backoff(error_class, attempt):
+    policy = get_retry_policy(error_class)
+    delay = policy.get("backoff", 30) * (2 ** attempt)
+    delay = min(delay, policy.get("max_backoff", 600))
+    return delay * random.uniform(0.8, 1.2)
+
+
+class RetryRequest:
+    def __init__(self, platforms, error_class, error, results=None):
+        self.platforms = platforms
+        self.error_class = error_class
+        self.error = error
+        self.results = results or {}
+
+    def __repr__(self):
+        return f"RetryRequest(platforms={self.platforms}, class={self.error_class}, error={self.error})"
+
+
+class RetryScheduler:
+    def __init__(self):
+        self._queue = []
+        self._sequence = itertools.count()
+        # Rate-limit deferrals, counted apart from rows parked in error backoff.
+        self.deferred = 0
+
+    def __len__(self):
+        return len(self._queue)
+
+    def schedule(self, item, error_class, attempt):
+        self.schedule_in(item, get_backoff(error_class, attempt))
+
+    def schedule_in(self, item, delay, deferral=False):
+        heapq.heappush(self._queue, (time.monotonic() + delay, next(self._sequence), deferral, item))
+        self.deferred += deferral
+
+    def pop_ready(self, limit):
+        ready = []
+        now = time.monotonic()
+        while self._queue and len(ready) < limit and self._queue[0][0] <= now:
+            _, _, deferral, item = heapq.heappop(self._queue)
+            self.deferred -= deferral
+            ready.append(item)
+        return ready
+
+    def next_ready_in(self):
+        if not self._queue:
+            return None
+        return max(self._queue[0][0] - time.monotonic(), 0)
@@ -0,0 +1,139 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from src.config import config
+from src.scanner.scan_result import ScanResult
+
+CACHE_PATH = os.path.join('.', 'src', 'data', 'cache', 'scan_cache.sqlite')
+
+
+class Claim:
+    def __init__(self, cached=None, owned=None, waiting=None, delay=0):
+        self.cached = cached or {}
+        self.owned = owned or []
+        self.waiting = waiting or {}
+        self.delay = delay
+
+    def __repr__(self):
+        return (f"Claim(cached={len(self.cached)}, owned={len(self.owned)}, waiting={len(self.waiting)}, "
+                f"delay={self.delay})")
+
+
+class ScanCache:
+    def __init__(self, path=CACHE_PATH, ttl=None, memory_size=None):
+        self.path = path
+        self.ttl = ttl if ttl is not None else config.get('scan_cache_ttl', 86400)
+        # Only the most recently used results stay in memory, the rest is read back from SQLite.
+        self.memory_size = memory_size or config.get('scan_cache_memory_size', 1024)
+        self._memory = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        # One SQLite connection per thread, so cache reads and writes never wait on the lock above.
+        self._local = threading.local()
+
+    def claim(self, keys, admit=None):
+        # Each uncached key is owned by exactly one caller, the others wait on its future. Before keys are owned,
+        # admit(count) may return a delay (e.g. a rate limit); then nothing is claimed.
+        keys = list(keys)
+        self._preload(keys)
+        cached, owned, waiting = {}, [], {}
+        with self._lock:
+            for key in keys:
+                value = self._get(key)
+                if value is not None:
+                    cached[key] = value
+                elif key in self._in_flight:
+                    waiting[key] = self._in_flight[key]
+                else:
+                    owned.append(key)
+            delay = admit(len(owned)) if owned and admit is not None else 0
+            if delay:
+                return Claim(delay=delay)
+            for key in owned:
+                self._in_flight[key] = Future()
+        return Claim(cached, owned, waiting)
+
+    def resolve(self, outcomes):
+        scanned_at = time.time()
+        with self._lock:
+            futures = {key: self._in_flight.pop(key) for key in outcomes if key in self._in_flight}
+            for key, outcome in outcomes.items():
+                if not isinstance(outcome, Exception):
+                    self._remember(key, outcome, scanned_at)
+        for key, future in futures.items():
+            if isinstance(outcomes[key], Exception):
+                future.set_exception(outcomes[key])
+            else:
+                future.set_result(outcomes[key])
+        for key, outcome in outcomes.items():
+            if not isinstance(outcome, Exception):
+                self._store(key, outcome, scanned_at)
+
+    def _preload(self, keys):
+        # Results of earlier runs are read from SQLite outside the lock.
+        with self._lock:
+            missing = [key for key in keys if self._get(key) is None and key not in self._in_flight]
+        for key in missing:
+            loaded = self._load(key)
+            if loaded is not None:
+                with self._lock:
+                    self._remember(key, *loaded)
+
+    def _get(self, key):
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        value, scanned_at = entry
+        if self.ttl and time.time() - scanned_at >= self.ttl:
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return value
+
+    def _remember(self, key, value, scanned_at):
+        self._memory[key] = (value, scanned_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _connect(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            connection = self._local.connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS scan_cache (domain TEXT, platform TEXT, "
+                               "language TEXT, scanned_at REAL, results TEXT, "
+                               "PRIMARY KEY (domain, platform, language))")
+        return connection
+
+    def _load(self, key):
+        if not self.ttl:
+            return None
+        try:
+            row = self._connect().execute(
+                "SELECT results, scanned_at FROM scan_cache WHERE domain = ? AND platform = ? AND language = ? "
+                "AND scanned_at >= ?", (*key, time.time() - self.ttl)).fetchone()
+        except sqlite3.Error as e:
+            logging.error(f"Error reading the scan cache: {e}")
+            return None
+        if row is None:
+            return None
+        return tuple(ScanResult(**result) if result else None for result in json.loads(row[0])), row[1]
+
+    def _store(self, key, value, scanned_at):
+        if not self.ttl:
+            return
+        results = json.dumps([vars(result) if result else None for result in value])
+        try:
+            with self._connect() as connection:
+                connection.execute("INSERT OR REPLACE INTO scan_cache VALUES (?, ?, ?, ?, ?)",
+                                   (*key, scanned_at, results))
+        except sqlite3.Error as e:
+            logging.error(f"Error writing the scan cache: {e}")
@@ -0,0 +1,158 @@
+import logging
+import os
+import threading
+
+import pandas as pd
+
+from src.config import config
+from src.scanner.checkpoint import Journal
+from src.scanner.history import order_by_expected_duration
+from src.scanner.metrics import metrics
+from src.scanner.result_db import result_database
+from src.scanner.result_store import CSV_STORE, PARQUET_STORE, SQLITE_STORE, CsvResultStore, ParquetResultStore
+from src.scanner.utils.utils import save, sanitize_url
+
+KEY_COLUMN = "ETER_ID"
+ERROR_COLUMNS = ["error", "error_class", "attempts", "platform", "precheck"]
+
+
+def get_result_store():
+    store = config.get('result_store', CSV_STORE)
+    if store == SQLITE_STORE:
+        return result_database
+    if store == PARQUET_STORE:
+        return ParquetResultStore()
+    return CsvResultStore()
+
+
+def get_platforms():
+    return [list(device.keys())[0] for device in config['user_agents']]
+
+
+class ScanJob:
+    def __init__(self, input_file, history=None, store=None, resolver=None):
+        self.input_file = input_file
+        self.history = history
+        self.resolver = resolver
+        self.store = store or get_result_store()
+        self.filename = os.path.basename(input_file)
+        self.country_code = self.filename[:2]
+        self.language = next((lang[self.country_code] for lang in config['languages'] if self.country_code in lang),
+                             'en')
+        self.url_column_name = None
+        self.source_columns = []
+        self.results_by_platform = {platform: [] for platform in get_platforms()}
+        self.errors = []
+        self.pending = 0
+        self.exhausted = False
+        self.saved = False
+        self.skipped = 0
+        self.unsaved = 0
+        # One journal per source file, removed once the file is finished so only an interrupted scan resumes.
+        self.journal = Journal(os.path.splitext(self.filename)[0])
+        self.lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self.exhausted and self.pending == 0
+
+    def load(self):
+        columns = pd.read_csv(self.input_file, nrows=0).columns
+        self.source_columns = [col for col in columns if col not in ERROR_COLUMNS]
+        self.url_column_name = next((col for col in columns if col.lower() == 'url'), None)
+        if self.url_column_name is None:
+            raise ValueError(f"No 'url' column found in CSV ({self.filename}).")
+        return self.read_rows()
+
+    def read_rows(self):
+        # The domains of the next chunk are resolved while this one is scanned, so the resolver only ever holds
+        # about two chunks per file.
+        chunks = pd.read_csv(self.input_file, chunksize=config.get('csv_chunk_size', 1000))
+        upcoming = self.prefetch(next(chunks, None))
+        while upcoming is not None:
+            chunk, upcoming = upcoming, self.prefetch(next(chunks, None))
+            chunk = chunk.drop(columns=[col for col in ERROR_COLUMNS if col in chunk.columns])
+            rows = []
+            for _, row in chunk.iterrows():
+                if not self.pending_platforms(row):
+                    self.skipped += 1
+                    continue
+                rows.append(row)
+            if self.history is not None:
+                rows = order_by_expected_duration(rows, self.expected_duration)
+            yield from rows
+        self.exhausted = True
+        if self.skipped:
+            logging.info(f"Skipped {self.skipped} already completed rows in {self.filename}")
+
+    def prefetch(self, chunk):
+        if chunk is not None and self.resolver is not None:
+            self.resolver.prefetch({sanitize_url(url) for url in chunk[self.url_column_name].dropna().astype(str)})
+        return chunk
+
+    def expected_duration(self, row):
+        return self.history.expected_duration(sanitize_url(str(row[self.url_column_name])))
+
+    def row_key(self, row):
+        return row.get(KEY_COLUMN, row[self.url_column_name])
+
+    def pending_platforms(self, row):
+        key = self.row_key(row)
+        return [platform for platform in get_platforms() if not self.journal.is_completed(key, platform)]
+
+    def error_row(self, row, error, error_class, attempt, platform, precheck=None):
+        # Every error row has all ERROR_COLUMNS, whichever path failed, so the error CSV keeps one header.
+        values = [str(error), error_class, attempt + 1, platform, precheck]
+        return {**row.to_dict(), **dict(zip(ERROR_COLUMNS, values))}
+
+    def commit(self, results_by_platform, errors):
+        with self.lock:
+            for platform, result in results_by_platform.items():
+                self.results_by_platform[platform].append(result)
+            if errors:
+                self.errors.extend(errors)
+
+    def is_full(self):
+        with self.lock:
+            buffered = sum(len(results) for results in self.results_by_platform.values()) + len(self.errors)
+        return buffered >= self.store.batch_size
+
+    def save(self):
+        with self.lock:
+            results_by_platform = self.results_by_platform
+            errors = self.errors
+            self.results_by_platform = {platform: [] for platform in get_platforms()}
+            self.errors = []
+
+        with metrics.labels(file=self.filename), metrics.timer("save"):
+            for platform, results in results_by_platform.items():
+                if not results:
+                    continue
+                try:
+                    self.store.write(results, self.country_code, platform)
+                except Exception as e:
+                    # The rows stay out of the journal, so the next run of this file scans them again.
+                    logging.error(f"Error saving {len(results)} {platform} results of {self.filename}: {e}")
+                    metrics.increment("save_error")
+                    self.unsaved += len(results)
+                    continue
+                self.journal.record((self.row_key(result), platform) for result in results)
+            if errors:
+                try:
+                    save(errors, self.country_code, '', error=True, columns=self.source_columns + ERROR_COLUMNS)
+                except Exception as e:
+                    logging.error(f"Error saving {len(errors)} errors of {self.filename}: {e}")
+                    metrics.increment("save_error")
+                    self.unsaved += len(errors)
+
+    def finish(self):
+        self.save()
+        self.saved = True
+        if self.unsaved:
+            logging.warning(f"{self.unsaved} rows of {self.filename} could not be saved, keeping its journal so "
+                            f"the next run scans only the rows missing from it.")
+            return
+        self.journal.clear()
+
+    def __repr__(self):
+        return f"ScanJob(file={self.filename}, language={self.language}, pending={self.pending})"
@@ -1,160 +1,470 @@
+import contextvars
 import logging
-import os
 import signal
 import sys
+import time
 
 import pandas as pd
+from selenium.common.exceptions import TimeoutException
 
-from src.scanner.browser import get_webdriver, get_scan_result
+from src.scanner.browser import is_headers_only, scan_url
+from src.scanner.contexts import browse_tabs
 from src.config import config
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
 
-from src.scanner.utils.utils import save, sanitize_url, normalize_domain
+from src.scanner.concurrency import ConcurrencyController
+from src.scanner.precheck import NOT_RESOLVED, check_reachability
+from src.scanner.driver_pool import DriverPool
+from src.scanner.grader import grader
+from src.scanner.history import TimingHistory, SUCCESS
+from src.scanner.metrics import metrics
+from src.scanner.probe import ProbeEscalation, probe_url
+from src.scanner.rate_limit import RateLimiter, Deferral, get_rate_limit_keys
+from src.scanner.resolver import Resolver
+from src.scanner.scan_cache import ScanCache
+from src.scanner.scan_result import ScanResult
+from src.scanner.retry import RetryScheduler, RetryRequest, BotBlockError, DNS, TIMEOUT, \
+    DRIVER_CRASH, classify, should_retry
+from src.scanner.scan_job import ScanJob
+from src.scanner.utils.utils import sanitize_url, normalize_domain
+from src.scanner.watchdog import DriverWatchdog
 
-lock = threading.Lock()
-
-results_by_platform = {list(device.keys())[0]: [] for device in config['user_agents']}
-errors = []
 HTTP = "http://"
 HTTPS = "https://"
-active_web_drivers = []
+PER_PLATFORM_MODE = "per_platform"
+SHARED_BROWSER_MODE = "shared"
+LOAD_ERRORS = (TIMEOUT, DRIVER_CRASH)
+driver_pool = DriverPool()
+driver_watchdog = DriverWatchdog(driver_pool)
+rate_limiter = RateLimiter()
+resolver = Resolver()
+scan_cache = ScanCache()
+timing_history = TimingHistory()
+platform_executor = ThreadPoolExecutor(
+    max_workers=ConcurrencyController().max_workers * max(len(config['user_agents']) - 1, 1),
+    thread_name_prefix="platform"
+)
 
 
 def signal_handler(sig, frame):
-    global active_web_drivers
     logging.warning("\nInterruption received. Ending active WebDrivers...")
-    for driver in active_web_drivers:
-        try:
-            driver.quit()
-        except Exception as e:
-            logging.error(f"Error quitting WebDriver: {e}")
+    driver_watchdog.stop()
+    driver_pool.shutdown()
+    # The pool is shut down, so whatever of ours is left is an orphan, however young.
+    driver_watchdog.reap_orphans(grace=0)
     sys.exit(0)
 
 
 signal.signal(signal.SIGINT, signal_handler)
+signal.signal(signal.SIGTERM, signal_handler)
 
 
 def run_scan(input_file):
-    global results_by_platform
-    global errors
-    errors = []
-    results_by_platform = {list(device.keys())[0]: [] for device in config['user_agents']}
-
-    filename = os.path.basename(input_file)
-    country_code = filename[:2]
-    language = next((lang[country_code] for lang in config['languages'] if country_code in lang), 'en')
-    max_threads = config.get('max_threads', 5)
-
-    df = pd.read_csv(input_file)
-    if "error" in df.columns:
-        df = df.drop(columns=["error"])
-
-    url_column_name = next((col for col in df.columns if col.lower() == 'url'), None)
-    if url_column_name is None:
-        raise ValueError(f"No 'url' column found in CSV ({filename}).")
-
-    with ThreadPoolExecutor(max_workers=max_threads) as executor:
-        futures = [executor.submit(row_scan, row, url_column_name, language) for index, row in df.iterrows()]
-        for future in as_completed(futures):
+    jobs = run_scans([input_file])
+    return jobs[0] if jobs else None
+
+
+def run_scans(input_files):
+    jobs = []
+    for input_file in input_files:
+        job = ScanJob(input_file, timing_history, resolver=resolver)
+        try:
+            jobs.append((job, job.load()))
+        except Exception as e:
+            logging.error(f"Error scanning {job.filename}: {e}")
+
+    controller = ConcurrencyController()
+    max_in_flight = config.get('max_in_flight', controller.max_workers)
+    max_deferred = config.get('max_deferred', max_in_flight * 4)
+    rows = interleave_rows(jobs)
+    retries = RetryScheduler()
+    executor = ThreadPoolExecutor(max_workers=controller.max_workers)
+    futures = {}
+    started = {}
+    metrics_interval = config.get('metrics_interval', 15)
+    metrics_written = time.monotonic()
+    driver_watchdog.start()
+    try:
+        while True:
+            capacity = min(controller.adjust(), max_in_flight)
+            metrics.set_gauge("concurrency_limit", capacity)
+            metrics.set_gauge("rows_in_flight", len(futures))
+            metrics.set_gauge("rows_deferred", retries.deferred)
+            metrics.set_gauge("rows_awaiting_retry", len(retries) - retries.deferred)
+            if time.monotonic() - metrics_written >= metrics_interval:
+                metrics.write_prometheus()
+                metrics_written = time.monotonic()
+
+            for job, row, platforms, attempt, results in retries.pop_ready(capacity - len(futures)):
+                future = executor.submit(row_scan, job, row, platforms, attempt, results)
+                futures[future] = (job, row, attempt, results)
+                started[future] = time.monotonic()
+            intake = max(capacity - len(futures), 0) if retries.deferred < max_deferred else 0
+            for job, row in islice(rows, intake):
+                future = executor.submit(row_scan, job, row)
+                futures[future] = (job, row, 0, None)
+                started[future] = time.monotonic()
+                job.pending += 1
+
+            for job, _ in jobs:
+                if job.done and not job.saved:
+                    logging.info(f"Finished scanning file: {job.filename}")
+                    job.finish()
+                    metrics.export_summary(job.filename)
+            if not futures and not retries:
+                break
+
+            # Ready retries can only be picked up once a slot frees, so don't wake up for them at capacity.
+            timeout = retries.next_ready_in() if len(futures) < capacity else None
+            if not futures:
+                # wait() returns straight away without futures, so sleep until the next retry is due.
+                time.sleep(timeout)
+                continue
+            done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                job, row, attempt, results = futures.pop(future)
+                duration = time.monotonic() - started.pop(future)
+                try:
+                    retry = future.result()  # Catch exceptions
+                except Exception as e:
+                    logging.error(f"Thread error in CSV ({job.filename}): {e}")
+                    retry = None
+                if not isinstance(retry, Deferral):
+                    controller.record(duration, isinstance(retry, RetryRequest) and retry.error_class in LOAD_ERRORS)
+                if isinstance(retry, Deferral):
+                    retries.schedule_in((job, row, retry.platforms, attempt, results), retry.delay, deferral=True)
+                    continue
+                if retry is not None:
+                    logging.info(f"Retrying {row[job.url_column_name]} ({retry.error_class}, attempt {attempt + 1})")
+                    retries.schedule((job, row, retry.platforms, attempt + 1, retry.results), retry.error_class,
+                                     attempt)
+                    continue
+                job.pending -= 1
+                if job.is_full():
+                    job.save()
+    finally:
+        driver_watchdog.stop()
+        executor.shutdown(wait=True, cancel_futures=True)
+        for job, _ in jobs:
+            job.save()
+            if not job.saved:
+                metrics.export_summary(job.filename)
+        metrics.write_prometheus()
+    return [job for job, _ in jobs]
+
+
+def interleave_rows(jobs):
+    iterators = list(jobs)
+    while iterators:
+        for job, rows in list(iterators):
             try:
-                future.result()  # Catch exceptions
-            except Exception as e:
-                logging.error(f"Thread error in CSV ({filename}): {e}")
+                row = next(rows)
+            except StopIteration:
+                iterators.remove((job, rows))
+                continue
+            yield job, row
 
-    for platform, results in results_by_platform.items():
-        save(results, country_code, platform)
-    if errors:
-        save(errors, country_code, '', error=True)
 
+def row_scan(job, row, platforms=None, attempt=0, results=None):
+    with metrics.labels(file=job.filename, url=sanitize_url(row[job.url_column_name])), metrics.timer("row"):
+        return scan_row(job, row, platforms, attempt, results)
 
-def row_scan(row, url_column_name, language):
-    global active_web_drivers
-    process_result_by_platform = {}
+
+def scan_row(job, row, platforms=None, attempt=0, results=None):
+    language = job.language
+    process_result_by_platform = dict(results or {})
     process_error = []
-    base_url = sanitize_url(row[url_column_name])
+    retry_platforms = []
+    retry_error = None
+    base_url = sanitize_url(row[job.url_column_name])
+
+    pending_platforms = platforms or job.pending_platforms(row)
+    if resolver.is_nxdomain(base_url):
+        logging.error(f"Error scanning {base_url} ({DNS}): NXDOMAIN")
+        error = f"net::ERR_NAME_NOT_RESOLVED (NXDOMAIN during pre-resolution of {base_url})"
+        metrics.increment(f"error_{DNS}")
+        job.commit(process_result_by_platform, [job.error_row(row, error, DNS, attempt, platform, NOT_RESOLVED)
+                                                for platform in pending_platforms])
+        return None
+
+    # Claimed before the host is contacted, so a duplicate row waits for the scan in flight instead of running the
+    # pre-check and spending rate limit tokens itself. A rate-limited row claims nothing and is deferred.
+    rate_limit_keys = get_rate_limit_keys(base_url, resolver)
+    claim = scan_cache.claim([(base_url, platform, language) for platform in pending_platforms],
+                             lambda count: rate_limiter.try_acquire(rate_limit_keys, cost=count))
+    if claim.delay:
+        metrics.increment("deferral")
+        return Deferral(pending_platforms, claim.delay, f"rate limit for {base_url}")
+
+    reachability = None
+    precheck_error = None
+    if claim.owned:
+        # Hosts that accept no connection fail here in seconds instead of a full browser timeout.
+        try:
+            with metrics.timer("precheck"):
+                reachability = check_reachability(base_url, resolver)
+        except Exception as e:
+            scan_cache.resolve({key: e for key in claim.owned})
+            raise
+        if not reachability.reachable:
+            precheck_error = reachability.error(base_url)
+
+    deadline = time.monotonic() + config.get('row_deadline', 240)
+    devices = [(platform, user_agent) for platform, user_agent in get_devices() if platform in pending_platforms]
+    for platform, outcome in scan_platforms(base_url, devices, language, claim, deadline, precheck_error).items():
+        if isinstance(outcome, Exception):
+            error_class = classify(outcome)
+            logging.error(f"Error scanning {base_url} - {platform} ({error_class}): {outcome}")
+            metrics.increment(f"error_{error_class}")
+            if should_retry(error_class, attempt):
+                retry_platforms.append(platform)
+                retry_error = retry_error or (error_class, str(outcome))
+            else:
+                process_error.append(job.error_row(row, outcome, error_class, attempt, platform,
+                                                   str(reachability) if reachability else None))
+            continue
+        process_result_by_platform[platform] = {**row.to_dict(), **outcome}
+
+    if retry_platforms:
+        # Hold finished platforms back so the row's results are committed together.
+        if process_error:
+            job.commit({}, process_error)
+        metrics.increment("retry")
+        return RetryRequest(retry_platforms, *retry_error, results=process_result_by_platform)
+    job.commit(process_result_by_platform, process_error)
+    metrics.increment("row_completed")
+    return None
+
+
+def get_devices():
+    return [(list(device.keys())[0], list(device.values())[0]) for device in config['user_agents']]
+
+
+def scan_platforms(base_url, devices, language, claim, deadline=None, error=None):
+    # Rows sharing a website are scanned once per (domain, platform, language) and the results fanned out.
+    keys = {platform: (base_url, platform, language) for platform, _ in devices}
+    metrics.increment("cache_hit", len(claim.cached) + len(claim.waiting))
+    owned_devices = [(platform, user_agent) for platform, user_agent in devices if keys[platform] in claim.owned]
+    scans = {}
+    started = time.monotonic()
+    try:
+        # A failed pre-check fails the owned platforms, and the rows waiting on them, without a browser.
+        scans = ({platform: error for platform, _ in owned_devices} if error is not None
+                 else scan_uncached(base_url, owned_devices, language, deadline))
+    except Exception as e:
+        scans = {key[1]: e for key in claim.owned}
+    finally:
+        scan_cache.resolve({key: scans.get(key[1], RuntimeError(f"No scan result for {key}"))
+                            for key in claim.owned})
+    if owned_devices and error is None:
+        failure = next((outcome for outcome in scans.values() if isinstance(outcome, Exception)), None)
+        timing_history.record(base_url, time.monotonic() - started, classify(failure) if failure else SUCCESS)
+
+    outcomes = {}
+    for platform, key in keys.items():
+        try:
+            if key in claim.cached:
+                http_result, https_result = claim.cached[key]
+            elif key in claim.waiting:
+                http_result, https_result = claim.waiting[key].result()
+            elif isinstance(scans[platform], Exception):
+                outcomes[platform] = scans[platform]
+                continue
+            else:
+                http_result, https_result = scans[platform]
+            outcomes[platform] = build_platform_result(base_url, platform, language, http_result, https_result)
+        except Exception as e:
+            outcomes[platform] = e
+    return outcomes
+
+
+def scan_uncached(base_url, devices, language, deadline=None):
+    if config.get('browser_mode', PER_PLATFORM_MODE) == SHARED_BROWSER_MODE:
+        return scan_platforms_shared(base_url, devices, language, deadline)
+    if not devices:
+        return {}
+
+    futures = {platform: platform_executor.submit(contextvars.copy_context().run, scan_platform, base_url, platform,
+                                                  user_agent, language, deadline)
+               for platform, user_agent in devices[1:]}
+    first_platform, first_user_agent = devices[0]
+    outcomes = {first_platform: scan_platform(base_url, first_platform, first_user_agent, language, deadline)}
+    for platform, future in futures.items():
+        outcomes[platform] = future.result()
+    return outcomes
+
+
+def scan_platform(base_url, platform, user_agent, language, deadline=None):
+    with metrics.labels(platform=platform):
+        try:
+            logging.info(f"Scanning HTTP: {base_url} - {platform}")
+            with metrics.timer("http"):
+                http_result = check_blocked(fetch(f"{HTTP}{base_url}", user_agent, language, deadline))
+            https_result = None
+            if not http_result.final_url.startswith(HTTPS):
+                logging.info(f"Scanning HTTPS: {HTTPS}{base_url} - {platform}")
+                with metrics.timer("https_fallback"):
+                    https_result = check_blocked(fetch(f"{HTTPS}{base_url}", user_agent, language, deadline))
+            return http_result, https_result
+        except Exception as e:
+            return e
+
+
+def scan_platforms_shared(base_url, devices, language, deadline=None):
     http_url = f"{HTTP}{base_url}"
     https_url = f"{HTTPS}{base_url}"
 
-    for device in config['user_agents']:
-        platform = list(device.keys())[0]
-        user_agent = list(device.values())[0]
-
-        result = {
-            "assessment_datetime": None,
-            "http_status_code": None,
-            "https_status_code": None,
-            "redirected_to_https": False,
-            "redirected_https_to_same_domain": False,
-            "final_url": None,
-            "idioma": language,
-            "platform": platform,
-            "protocol_http": None,
-            "redirect_count": None,
-        }
-
-        web_driver = get_webdriver(user_agent, language)
-        active_web_drivers.append(web_driver)
+    logging.info(f"Scanning HTTP: {base_url} - {', '.join(platform for platform, _ in devices)}")
+    with metrics.timer("http"):
+        http_results = fetch_shared(http_url, devices, language, deadline)
+    https_devices = [(platform, user_agent) for platform, user_agent in devices
+                     if isinstance(http_results.get(platform), ScanResult)
+                     and not http_results[platform].final_url.startswith(HTTPS)]
+    https_results = {}
+    if https_devices:
+        logging.info(f"Scanning HTTPS: {https_url}")
+        with metrics.timer("https_fallback"):
+            https_results = fetch_shared(https_url, https_devices, language, deadline)
+
+    outcomes = {}
+    for platform, _ in devices:
+        http_result = http_results[platform]
+        https_result = https_results.get(platform)
+        if isinstance(http_result, Exception) or isinstance(https_result, Exception):
+            outcomes[platform] = http_result if isinstance(http_result, Exception) else https_result
+            continue
+        outcomes[platform] = (http_result, https_result)
+    return outcomes
+
+
+def build_platform_result(base_url, platform, language, http_result, https_result=None):
+    result = {
+        "assessment_datetime": None,
+        "http_status_code": http_result.initial_status,
+        "https_status_code": None,
+        "redirected_to_https": http_result.final_url.startswith(HTTPS),
+        "redirected_https_to_same_domain": False,
+        "final_url": None,
+        "idioma": language,
+        "platform": platform,
+        "protocol_http": None,
+        "redirect_count": None,
+    }
+    scan_result = http_result
+    if result["redirected_to_https"]:
+        result["https_status_code"] = http_result.final_status
+        base_domain = normalize_domain(base_url)
+        final_domain = normalize_domain(http_result.final_url)
+        result["redirected_https_to_same_domain"] = base_domain == final_domain
+    else:
+        scan_result = https_result
+        result["https_status_code"] = https_result.final_status
+
+    result.update({
+        "protocol_http": scan_result.protocol,
+        "final_url": scan_result.final_url,
+        "redirect_count": scan_result.redirect_count,
+        "assessment_datetime": pd.Timestamp.now(),
+        **assessing_security_headers(scan_result.headers)
+    })
+    return result
+
+
+def check_blocked(scan_result):
+    mitigated = next((v for k, v in scan_result.headers.items() if k.lower() == "cf-mitigated"), "")
+    if scan_result.final_status == 429 or mitigated.lower() == "challenge":
+        raise BotBlockError(f"Blocked by bot protection ({scan_result.final_status}) at {scan_result.final_url}")
+    return scan_result
+
+
+def fetch_shared(url, devices, language, deadline=None):
+    results = {}
+    escalated = []
+    for platform, user_agent in devices:
         try:
-            logging.info(f"Scanning HTTP: {base_url} - {platform}")
-            web_driver.get(http_url)
-            scan_result = get_scan_result(web_driver)
-            result["http_status_code"] = scan_result.initial_status
-            result["redirected_to_https"] = scan_result.final_url.startswith(HTTPS)
-            if result["redirected_to_https"]:
-                result["https_status_code"] = scan_result.final_status
-                base_domain = normalize_domain(base_url)
-                final_domain = normalize_domain(scan_result.final_url)
-                result["redirected_https_to_same_domain"] = base_domain == final_domain
-
-            if not result["redirected_to_https"]:
-                logging.info(f"Scanning HTTPS: {https_url}")
-                web_driver.quit()
-                active_web_drivers.remove(web_driver)
-                web_driver = get_webdriver(user_agent, language)
-                active_web_drivers.append(web_driver)
-                web_driver.get(https_url)
-                scan_result = get_scan_result(web_driver)
-                result["https_status_code"] = scan_result.final_status
-
-            result.update({
-                "protocol_http": scan_result.protocol,
-                "final_url": scan_result.final_url,
-                "redirect_count": scan_result.redirect_count,
-                "assessment_datetime": pd.Timestamp.now(),
-                **assessing_security_headers(scan_result.headers)
-            })
-            process_result_by_platform[platform] = {**row.to_dict(), **result}
+            scan_result = try_probe(url, user_agent, language, deadline)
+            if scan_result is None:
+                escalated.append((platform, user_agent))
+                continue
+            results[platform] = check_blocked(scan_result)
         except Exception as e:
-            logging.error(f"Error scanning {base_url} - {platform}: {e}")
-            error_result = {**row.to_dict(), "error": str(e)}
-            process_error.append(error_result)
-            break
-        finally:
-            web_driver.quit()
-            active_web_drivers.remove(web_driver)
-
-    with lock:
-        for platform, result in process_result_by_platform.items():
-            results_by_platform[platform].append(result)
-        if process_error:
-            errors.extend(process_error)
+            results[platform] = e
 
+    if escalated and needs_page_load():
+        # Shared tabs stop at the first document response, so escalations and full profile scans go through the
+        # per-platform drivers, which wait for the load and any client-side redirect.
+        futures = {platform: platform_executor.submit(contextvars.copy_context().run, browse_checked, url,
+                                                      user_agent, language, deadline)
+                   for platform, user_agent in escalated}
+        results.update({platform: future.result() for platform, future in futures.items()})
+    elif escalated:
+        shared_user_agent = get_devices()[0][1]
+        try:
+            timeout = get_timeout(deadline, config.get('timeout', 60))
+            with driver_pool.lease(shared_user_agent, language, shared=True) as web_driver:
+                tab_results = browse_tabs(web_driver, url, escalated, language, timeout)
+        except Exception as e:
+            tab_results = {platform: e for platform, _ in escalated}
+        for platform, outcome in tab_results.items():
+            try:
+                results[platform] = outcome if isinstance(outcome, Exception) else check_blocked(outcome)
+            except BotBlockError as e:
+                results[platform] = e
+    return results
+
+
+def needs_page_load():
+    # With the probe engine the browser only gets escalations (challenges, client-side redirects).
+    return not is_headers_only() or is_probe_engine()
+
+
+def is_probe_engine():
+    return config.get('scan_engine', 'browser') == 'probe'
 
-def assessing_security_headers(received_headers):
-    analysis = {}
-    normalized_received_headers = {k.lower(): v for k, v in received_headers.items()}
-    normalized_expected_headers = {k.lower(): v for k, v in config['expected_headers'].items()}
 
-    for expected_header, heuristic in normalized_expected_headers.items():
-        received_header = normalized_received_headers.get(expected_header, "Missing")
-        analysis[f"{expected_header}_presence"] = received_header != "Missing"
+def browse_checked(url, user_agent, language, deadline=None):
+    try:
+        return check_blocked(browse(url, user_agent, language, deadline, is_probe_engine()))
+    except Exception as e:
+        return e
 
-        if received_header != "Missing":
-            analysis[f"{expected_header}_config"] = heuristic(received_header)
-        else:
-            analysis[f"{expected_header}_config"] = "Missing"
 
-    analysis['raw_headers'] = str(received_headers)
+def try_probe(url, user_agent, language, deadline=None):
+    if not is_probe_engine():
+        return None
+    try:
+        with metrics.timer("probe"):
+            return probe_url(url, user_agent, language, resolver,
+                             get_timeout(deadline, config.get('probe_timeout', 15)))
+    except ProbeEscalation as e:
+        logging.info(f"Escalating {url} to browser: {e}")
+        metrics.increment("probe_escalation")
+        return None
 
-    return analysis
+
+def fetch(url, user_agent, language, deadline=None):
+    scan_result = try_probe(url, user_agent, language, deadline)
+    if scan_result is not None:
+        return scan_result
+    # With the probe engine the browser only gets escalations, which need the fully loaded page.
+    return browse(url, user_agent, language, deadline, is_probe_engine())
+
+
+def browse(url, user_agent, language, deadline=None, escalated=False):
+    timeout = get_timeout(deadline, config.get('timeout', 60))
+    with driver_pool.lease(user_agent, language) as web_driver:
+        return scan_url(web_driver, url, timeout, escalated)
+
+
+def get_timeout(deadline, limit):
+    if deadline is None:
+        return limit
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutException("Row deadline exceeded before the scan could start")
+    return min(limit, remaining)
+
+
+def assessing_security_headers(received_headers):
+    return grader.assess(received_headers)
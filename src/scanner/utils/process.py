@@ -0,0 +1,131 @@
+import os
+import signal
+
+PROC_DIRECTORY = "/proc"
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def get_rss(pid):
+    try:
+        with open(os.path.join(PROC_DIRECTORY, str(pid), "statm"), encoding='utf-8') as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def read_stat(pid):
+    try:
+        with open(os.path.join(PROC_DIRECTORY, str(pid), "stat"), encoding='utf-8') as stat:
+            content = stat.read()
+    except OSError:
+        return None
+    # The command name may contain spaces, the fields after it are fixed.
+    name = content[content.find("(") + 1:content.rfind(")")]
+    fields = content.rsplit(")", 1)[1].split()
+    if len(fields) < 2 or not fields[1].isdigit():
+        return None
+    return name, fields[0], int(fields[1])
+
+
+def read_cmdline(pid):
+    try:
+        with open(os.path.join(PROC_DIRECTORY, str(pid), "cmdline"), mode='rb') as cmdline:
+            return cmdline.read().decode('utf-8', errors='replace').split("\0")
+    except OSError:
+        return []
+
+
+def get_age(pid):
+    # Seconds since the process started: its start time is field 22 of stat, in clock ticks after boot.
+    try:
+        with open(os.path.join(PROC_DIRECTORY, str(pid), "stat"), encoding='utf-8') as stat:
+            started = int(stat.read().rsplit(")", 1)[1].split()[19]) / CLOCK_TICKS
+        with open(os.path.join(PROC_DIRECTORY, "uptime"), encoding='utf-8') as uptime:
+            return float(uptime.read().split()[0]) - started
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def list_processes():
+    processes = {}
+    try:
+        entries = os.listdir(PROC_DIRECTORY)
+    except OSError:
+        return processes
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        stat = read_stat(entry)
+        if stat is not None:
+            processes[int(entry)] = stat
+    return processes
+
+
+def get_parent_ids():
+    return {pid: parent for pid, (_, _, parent) in list_processes().items()}
+
+
+def get_descendants(pid, parents=None):
+    parents = parents if parents is not None else get_parent_ids()
+    children = {}
+    for child, parent in parents.items():
+        children.setdefault(parent, []).append(child)
+    descendants = []
+    pending = list(children.get(pid, []))
+    while pending:
+        child = pending.pop()
+        descendants.append(child)
+        pending.extend(children.get(child, []))
+    return descendants
+
+
+def get_tree_rss(pid):
+    return get_rss(pid) + sum(get_rss(child) for child in get_descendants(pid))
+
+
+def is_running(pid):
+    stat = read_stat(pid)
+    return stat is not None and stat[1] != "Z"
+
+
+def kill_tree(pid, descendants=None):
+    descendants = descendants if descendants is not None else get_descendants(pid)
+    return kill_processes([pid, *descendants])
+
+
+def kill_processes(pids):
+    killed = []
+    for process in pids:
+        try:
+            os.kill(process, signal.SIGKILL)
+            killed.append(process)
+        except (ProcessLookupError, PermissionError):
+            continue
+    reap_zombies(killed)
+    return killed
+
+
+def reap_zombies(pids):
+    for pid in pids:
+        try:
+            os.waitpid(pid, os.WNOHANG)
+        except ChildProcessError:
+            continue
+
+
+def find_orphans(names, marker, exclude=(), min_age=0):
+    # Only processes we started are candidates: our own children (chromedriver, and Chrome once reparented to us
+    # as PID 1) and Chrome launched with our marker on its command line. Younger ones may belong to a driver that
+    # is still starting.
+    exclude = set(exclude)
+    orphans = []
+    for pid, (name, state, parent) in list_processes().items():
+        if pid in exclude or state == "Z" or not name.startswith(tuple(names)):
+            continue
+        if parent != os.getpid() and not any(argument.startswith(marker) for argument in read_cmdline(pid)):
+            continue
+        if get_age(pid) < min_age:
+            continue
+        orphans.append(pid)
+    return orphans
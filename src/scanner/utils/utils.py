@@ -1,3 +1,4 @@
+import logging
 import os
 import pandas as pd
 from urllib.parse import urlparse
@@ -15,7 +16,7 @@ def normalize_domain(url):
     return domain.split(':')[0]
 
 
-def save(dataframe, country_code, platform=None, error=False):
+def save(dataframe, country_code, platform=None, error=False, columns=None):
     folder = 'errors' if error else 'results'
     output_dir = os.path.join('.', 'src', 'data', folder)
 
@@ -25,32 +26,45 @@ def save(dataframe, country_code, platform=None, error=False):
     output_file = os.path.join(output_dir, filename)
 
     if isinstance(dataframe, list):
-        df = pd.DataFrame(dataframe)
+        df = pd.DataFrame(dataframe, columns=columns)
     else:
-        df = dataframe
+        df = dataframe if columns is None else dataframe.reindex(columns=columns)
+
+    if df.empty:
+        return
+    if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
+        header = list(pd.read_csv(output_file, nrows=0).columns)
+        extra = [column for column in df.columns if column not in header]
+        if extra:
+            # Appended rows have to follow the existing header, so new columns rewrite the file instead.
+            logging.info(f"Adding the columns {extra} to {filename}")
+            existing = pd.read_csv(output_file, dtype=str, keep_default_na=False)
+            write_csv(pd.concat([existing, df], ignore_index=True).reindex(columns=header + extra), output_file)
+            return
+        df = df.reindex(columns=header)
+        write_header = False
+    else:
+        write_header = True
+    with open(output_file, mode='a', newline='', encoding='utf-8') as f:
+        df.to_csv(f, header=write_header, index=False)
+        f.flush()
+        os.fsync(f.fileno())
 
-    if not df.empty:
-        if os.path.exists(output_file):
-            df.to_csv(output_file, mode='a', header=False, index=False)
-        else:
-            df.to_csv(output_file, index=False)
+
+def write_csv(df, output_file):
+    temporary_file = f"{output_file}.part"
+    with open(temporary_file, mode='w', newline='', encoding='utf-8') as f:
+        df.to_csv(f, index=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary_file, output_file)
 
 
 def check_error_files():
-    error_directory = os.path.join('..', '..', 'data', 'errors')
+    error_directory = os.path.join('.', 'src', 'data', 'errors')
+    if not os.path.isdir(error_directory):
+        return False
     files = [f for f in os.listdir(error_directory) if f.endswith('.csv')]
     if files:
         return True
     return False
-
-def reset_error_files():
-    source_directory = os.path.join('..', '..', 'data', 'source')
-    error_directory = os.path.join('..', '..', 'data', 'errors')
-    files = [f for f in os.listdir(source_directory) if f.endswith('.csv')]
-    for file in files:
-        os.remove(os.path.join(source_directory, file))
-
-    error_files = [f for f in os.listdir(error_directory) if f.endswith('.csv')]
-    for file in error_files:
-        os.rename(os.path.join(error_directory, file), os.path.join(source_directory, file))
-    return True
@@ -0,0 +1,77 @@
+import logging
+import os
+import threading
+import time
+
+from src.config import config
+from src.scanner.browser import PROFILE_DIRECTORY
+from src.scanner.utils.process import find_orphans, get_descendants, get_rss, kill_processes, list_processes, \
+    reap_zombies
+
+MEGABYTE = 1024 * 1024
+ORPHAN_NAMES = ("chromedriver", "chrome", "headless_shell")
+PROFILE_MARKER = f"--user-data-dir={os.path.join(PROFILE_DIRECTORY, '')}"
+
+
+class DriverWatchdog:
+    def __init__(self, pool, interval=None, max_rss_mb=None, max_lease=None):
+        self.pool = pool
+        self.interval = interval or config.get('watchdog_interval', 30)
+        self.max_rss = (max_rss_mb or config.get('driver_max_rss_mb', 1536)) * MEGABYTE
+        self.max_lease = max_lease or config.get('driver_max_lease', 300)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="driver-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logging.error(f"Error in WebDriver watchdog: {e}")
+
+    def check(self):
+        now = time.monotonic()
+        processes = list_processes()
+        parents = {pid: parent for pid, (_, _, parent) in processes.items()}
+        tracked = set()
+        for pooled in self.pool.drivers():
+            if pooled.pid is None or pooled.killed is not None:
+                continue
+            tree = [pooled.pid, *get_descendants(pooled.pid, parents)]
+            tracked.update(tree)
+            rss = sum(get_rss(pid) for pid in tree)
+            if rss > self.max_rss:
+                self.pool.kill(pooled, f"{rss / MEGABYTE:.0f} MB RSS over the {self.max_rss / MEGABYTE:.0f} MB ceiling")
+            elif pooled.leased_at is not None and now - pooled.leased_at > self.max_lease:
+                self.pool.kill(pooled, f"leased for {now - pooled.leased_at:.0f}s")
+
+        # Exited children of ours that nobody waited for, e.g. chromedriver after a crash.
+        reap_zombies([pid for pid, (_, state, parent) in processes.items()
+                      if parent == os.getpid() and state == "Z" and pid not in tracked])
+        self.reap_orphans(tracked)
+
+    def reap_orphans(self, tracked=None, grace=None):
+        if not config.get('reap_orphans', True):
+            return
+        if tracked is None:
+            parents = {pid: parent for pid, (_, _, parent) in list_processes().items()}
+            tracked = {pid for pooled in self.pool.drivers() if pooled.pid is not None
+                       for pid in (pooled.pid, *get_descendants(pooled.pid, parents))}
+        grace = grace if grace is not None else config.get('orphan_grace_period', 120)
+        orphans = find_orphans(ORPHAN_NAMES, PROFILE_MARKER, exclude=tracked, min_age=grace)
+        if orphans:
+            logging.warning(f"Killing {len(orphans)} orphaned Chrome processes: {orphans}")
+            kill_processes(orphans)